@@ -0,0 +1,46 @@
+import sys
+import os
+import argparse
+
+# Add parent directory to path to import src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.timeseries import FREQUENCIES
+
+def main():
+    parser = argparse.ArgumentParser(description="Write PDF reports and JSON metrics for many journals without the web UI.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="directory of journal files")
+    source.add_argument("--db", action="store_true", help="journals from the trade store, one per --by value")
+    parser.add_argument("--pattern", default="*.csv", help="file pattern inside --dir")
+    parser.add_argument("--by", default="market", help="column that splits the trade store into journals")
+    parser.add_argument("--output", default="reports", help="directory for reports, manifest and leaderboard")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rebuild reports even if the journal is unchanged")
+    parser.add_argument("--sim-paths", type=int, default=0, help="add a Monte Carlo section with this many paths")
+    parser.add_argument("--freq", choices=list(FREQUENCIES), default="D", help="calendar frequency for time-based risk")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args()
+
+    from src.batch import journals_from_dir, journals_from_store, write_reports
+
+    journals = journals_from_dir(args.dir, args.pattern) if args.dir else journals_from_store(by=args.by)
+    if not journals:
+        print("No journals found.")
+        return
+
+    def progress(done, total, result):
+        status = "ok" if result["error"] is None else f"FAILED ({result['error']})"
+        print(f"[{done}/{total}] {result['name']}: {status} {result['seconds']:.1f}s", flush=True)
+
+    out = write_reports(journals, args.output, workers=args.workers, force=args.force,
+                        sim_paths=args.sim_paths, freq=args.freq, progress=None if args.quiet else progress)
+    print(f"{len(out['processed'])} written, {len(out['skipped'])} unchanged, {len(out['errors'])} failed "
+          f"in {out['seconds']:.1f}s -> {args.output}")
+    for name, error in out["errors"].items():
+        print(f"    {name}: {error}")
+    if out["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import sys
+import os
+import gc
+import json
+import shutil
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from seed_db import make_sample_trades
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+def measure(fn, repeat=1, setup=None):
+    """Best wall time over repeat runs, then one extra run under tracemalloc for peak memory."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak / 1024 ** 2
+
+def bench_size(n, workdir, repeat=1):
+    """Run every pipeline stage on a synthetic journal of n trades."""
+    from sqlalchemy import delete
+    from src.data_processor import load_csv, process_data
+    from src.database import get_engine, init_db, save_trades_to_db, load_trades_from_db, Trade
+    from src.parquet_store import save_trades_to_parquet
+    from src.analytics import calculate_metrics, get_best_worst_trades, rolling_metrics
+    from src.timeseries import time_metrics, period_cache
+    from src.visualizer import (
+        plot_equity_curve, plot_win_loss_dist, plot_pnl_dist, plot_market_breakdown,
+        plot_rr_vs_pnl, plot_monthly_pnl, plot_rolling_metrics, fig_to_png
+    )
+    from src.reporter import generate_pdf_report
+
+    csv_path = os.path.join(workdir, f"bench_{n}.csv")
+    parquet_root = os.path.join(workdir, "bench_parquet")
+    make_sample_trades(n).to_csv(csv_path, index=False)
+
+    def reset_db():
+        init_db()
+        with get_engine().begin() as conn:
+            conn.execute(delete(Trade))
+
+    def reset_parquet():
+        shutil.rmtree(parquet_root, ignore_errors=True)
+
+    results = []
+
+    def run(stage, fn, setup=None):
+        value, seconds, peak_mb = measure(fn, repeat, setup)
+        results.append({"size": n, "stage": stage, "seconds": seconds, "peak_mb": peak_mb})
+        print(f"{n:>10,} {stage:<28} {seconds:>9.3f}s {peak_mb:>9.1f} MB")
+        return value
+
+    def read_csv():
+        with open(csv_path, "rb") as f:
+            return load_csv(f)
+
+    raw = run("load_csv", read_csv)
+    df, resolved = run("process_data", lambda: process_data(raw))
+    run("process_data_compact", lambda: process_data(raw, compact=True))
+    run("save_trades_to_db", lambda: save_trades_to_db(df, resolved, bulk=True), setup=reset_db)
+    run("load_trades_from_db", load_trades_from_db)
+    # Synthetic dates span decades, so this also writes well over pyarrow's default 1024 partitions
+    run("save_trades_to_parquet", lambda: save_trades_to_parquet(df, resolved, parquet_root), setup=reset_parquet)
+    metrics = run("calculate_metrics", lambda: calculate_metrics(df, resolved))
+    run("get_best_worst_trades", lambda: get_best_worst_trades(df, resolved))
+    rolling = run("rolling_metrics", lambda: rolling_metrics(df, resolved))
+    run("time_metrics", lambda: time_metrics(df, resolved), setup=period_cache.clear)
+
+    pnl = metrics["pnl_series"]
+    plots = {
+        "plot_equity_curve": lambda: plot_equity_curve(metrics),
+        "plot_win_loss_dist": lambda: plot_win_loss_dist(df, pnl),
+        "plot_pnl_dist": lambda: plot_pnl_dist(pnl),
+        "plot_market_breakdown": lambda: plot_market_breakdown(df, resolved),
+        "plot_rr_vs_pnl": lambda: plot_rr_vs_pnl(df, resolved, pnl),
+        "plot_monthly_pnl": lambda: plot_monthly_pnl(df, resolved, resolved["pnl"])[1],
+        "plot_rolling_metrics": lambda: plot_rolling_metrics(rolling)
+    }
+    images = []
+    for stage, plot in plots.items():
+        # Drawing is lazy, so each stage includes rendering the PNG
+        def render(plot=plot):
+            fig = plot()
+            return fig_to_png(fig) if fig is not None else None
+
+        png = run(stage, render)
+        if png:
+            images.append(png)
+
+    run("generate_pdf_report", lambda: generate_pdf_report(metrics, images))
+    return results
+
+def compare(results, baseline, threshold, min_seconds=0.01):
+    """Print per-stage ratios against a baseline run; return the regressions.
+
+    Stages faster than min_seconds in both runs are reported but never flagged, since their timings are mostly noise.
+    """
+    base = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'size':>10} {'stage':<28} {'base':>9} {'now':>9} {'ratio':>7}")
+    for r in results:
+        old = base.get((r["size"], r["stage"]))
+        if not old:
+            continue
+        ratio = r["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf")
+        noisy = max(r["seconds"], old["seconds"]) < min_seconds
+        flag = " <-- slower" if ratio > 1 + threshold and not noisy else ""
+        print(f"{r['size']:>10,} {r['stage']:<28} {old['seconds']:>8.3f}s {r['seconds']:>8.3f}s {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append({**r, "baseline_seconds": old["seconds"], "ratio": ratio})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest -> process -> metrics -> report pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="journal sizes to benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per stage (best is kept)")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown vs baseline before a stage counts as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.01,
+                        help="stages faster than this are never flagged as regressions")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    results = []
+    from src.database import configure_engine, get_engine
+    with tempfile.TemporaryDirectory() as workdir:
+        # Point the store at a scratch file explicitly: reset_db deletes every trade, and
+        # TRADETRACK_DB_URL may name the user's real journal
+        configure_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        try:
+            for n in args.sizes:
+                results.extend(bench_size(n, workdir, args.repeat))
+        finally:
+            get_engine().dispose()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__
+        },
+        "results": results
+    }
+    if baseline:
+        report["regressions"] = compare(results, baseline, args.threshold, args.min_seconds)
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if baseline and report["regressions"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import sys
+import os
+import ast
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "streamlit_app.py")
+
+def app_modules(path=APP_PATH):
+    """Modules the app imports at startup: every import statement outside a function or class body."""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    nodes = list(tree.body)
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+        nodes[:0] = list(ast.iter_child_nodes(node))
+    return list(dict.fromkeys(modules))
+
+# Read from streamlit_app.py so a new top-level import is measured without editing this list
+APP_MODULES = app_modules()
+# Heavy dependencies that must only load on first use
+LAZY_MODULES = ["matplotlib", "plotly.express", "reportlab", "chardet"]
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (name, depth, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative, name = line.split("|", 2)
+        self_us = int(head.split(":")[1])
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, self_us, int(cumulative)))
+    return rows
+
+def measure(modules, lazy):
+    """Import modules in a fresh interpreter; return the importtime rows and any eagerly loaded lazy modules."""
+    code = (
+        "import sys, json\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + f"print(json.dumps([m for m in {lazy!r} if m in sys.modules]))"
+    )
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr), json.loads(proc.stdout.strip().splitlines()[-1])
+
+def summarize(rows, modules, top):
+    """Total import time, per-app-module cumulative time and the heaviest packages, in ms."""
+    total = sum(cum for _, depth, _, cum in rows if depth == 0)
+    cumulative = {}
+    for name, _, _, cum in rows:
+        cumulative.setdefault(name, cum / 1000)
+    heaviest = sorted(((name, cum / 1000) for name, depth, _, cum in rows if depth <= 1),
+                      key=lambda r: r[1], reverse=True)[:top]
+    return {
+        "total_ms": total / 1000,
+        "modules": {m: cumulative.get(m, 0.0) for m in modules},
+        "heaviest": [{"module": name, "ms": ms} for name, ms in heaviest]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the app's cold-start import time with python -X importtime.")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to run (the fastest is kept)")
+    parser.add_argument("--top", type=int, default=15, help="heaviest packages to list")
+    parser.add_argument("--output", help="write the JSON summary here")
+    parser.add_argument("--budget-ms", type=float, help="exit 1 if the total import time exceeds this")
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        rows, eager = measure(APP_MODULES, LAZY_MODULES)
+        summary = summarize(rows, APP_MODULES, args.top)
+        if best is None or summary["total_ms"] < best["total_ms"]:
+            best = summary
+    best["eager_lazy_modules"] = eager
+
+    print(f"Total import time: {best['total_ms']:.1f} ms")
+    for name, ms in best["modules"].items():
+        print(f"  {name:<22} {ms:>8.1f} ms")
+    print("Heaviest packages:")
+    for row in best["heaviest"]:
+        print(f"  {row['module']:<40} {row['ms']:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(best, f, indent=2)
+
+    failed = False
+    if eager:
+        print(f"Loaded at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and best["total_ms"] > args.budget_ms:
+        print(f"Import time {best['total_ms']:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
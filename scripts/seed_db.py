@@ -1,80 +1,146 @@
 import sys
 import os
+import time
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 
 # Add parent directory to path to import src
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.database import init_db, save_trades_to_db
+from src.database import init_db, save_trades_to_db, BULK_BATCH_SIZE
 
-def generate_sample_trades(n=100):
-    np.random.seed(42)
-    markets = ["Bitcoin", "Ethereum", "BankNifty", "Nifty 50", "Apple", "Tesla", "Gold", "EUR/USD"]
-    directions = ["Buy", "Sell"]
-    
-    start_date = datetime.now() - timedelta(days=365)
-    data = []
-    
-    current_equity = 10000
-    
-    for i in range(n):
-        trade_date = start_date + timedelta(days=i * 3 + np.random.randint(0, 3))
-        market = np.random.choice(markets)
-        direction = np.random.choice(directions)
-        
-        # Base prices
-        if "Bitcoin" in market: base_price = 40000
-        elif "Equity" in market or "Nifty" in market: base_price = 18000
-        elif "Gold" in market: base_price = 2000
-        else: base_price = 150
-        
-        entry = base_price + np.random.normal(0, base_price * 0.02)
-        
-        # RR and Outcome
-        # 45% win rate, but higher RR
-        is_win = np.random.random() < 0.45
-        
-        if is_win:
-            rr = np.random.uniform(1.5, 4.0)
-            risk = entry * 0.01 # 1% risk
-            pnl = risk * rr
-            exit_price = entry + (entry * 0.01 * rr) if direction == "Buy" else entry - (entry * 0.01 * rr)
-            stop_loss = entry - (entry * 0.01) if direction == "Buy" else entry + (entry * 0.01)
-            take_profit = exit_price
-            notes = "Target hit. Followed setup."
-        else:
-            risk = entry * 0.01
-            pnl = -risk
-            exit_price = entry - (entry * 0.01) if direction == "Buy" else entry + (entry * 0.01)
-            stop_loss = exit_price
-            take_profit = entry + (entry * 0.02) if direction == "Buy" else entry - (entry * 0.02)
-            notes = "Stop loss hit. Market reversed."
-            
-        data.append({
-            "date": trade_date,
-            "market": market,
-            "direction": direction,
-            "entry": round(entry, 2),
-            "stop_loss": round(stop_loss, 2),
-            "take_profit": round(take_profit, 2),
-            "exit_price": round(exit_price, 2),
-            "quantity": 1,
-            "pnl": round(pnl, 2),
-            "notes": notes
+SAMPLE_MAPPING = {
+    'date': 'date', 'market': 'market', 'direction': 'direction',
+    'entry': 'entry', 'stop_loss': 'stop_loss', 'take_profit': 'take_profit',
+    'exit_price': 'exit_price', 'quantity': 'quantity', 'pnl': 'pnl', 'notes': 'notes'
+}
+
+DIRECTIONS = ["Buy", "Sell"]
+NOTES = ["Target hit. Followed setup.", "Stop loss hit. Market reversed."]
+MARKETS = ["Bitcoin", "Ethereum", "BankNifty", "Nifty 50", "Apple", "Tesla", "Gold", "EUR/USD"]
+BASE_PRICES = {"Bitcoin": 40000, "BankNifty": 18000, "Nifty 50": 18000, "Gold": 2000}
+DEFAULT_BASE_PRICE = 150
+DEFAULT_START_DATE = "2024-01-01"
+CHUNK_SIZE = 1_000_000
+
+def generate_trades(n, seed=42, chunk_size=CHUNK_SIZE, market_mix=None, win_rate=0.45,
+                    trades_per_day=None, start_date=None):
+    """Yield n synthetic trades as dataframe chunks, drawing every field as a NumPy array.
+
+    market_mix maps market name -> weight (uniform over MARKETS by default). Dates
+    advance by exponential gaps averaging 1 / trades_per_day days; by default the
+    frequency is raised for very large n so dates stay within ~100 years. Output is
+    reproducible for a given seed and chunk_size.
+    """
+    rng = np.random.default_rng(seed)
+    market_mix = market_mix or {m: 1.0 for m in MARKETS}
+    markets = list(market_mix)
+    weights = np.array(list(market_mix.values()), dtype=float)
+    weights /= weights.sum()
+    base_prices = np.array([BASE_PRICES.get(m, DEFAULT_BASE_PRICE) for m in markets], dtype=float)
+    if trades_per_day is None:
+        trades_per_day = max(1 / 3, n / 36500)
+
+    current = pd.Timestamp(start_date or DEFAULT_START_DATE)
+    for offset in range(0, n, chunk_size):
+        k = min(chunk_size, n - offset)
+        m_idx = rng.choice(len(markets), size=k, p=weights)
+        sign = np.where(rng.random(k) < 0.5, 1.0, -1.0)
+        base = base_prices[m_idx]
+        entry = base + rng.normal(0, 1, k) * base * 0.02
+        is_win = rng.random(k) < win_rate
+        rr = rng.uniform(1.5, 4.0, k)
+        risk = entry * 0.01
+
+        pnl = np.where(is_win, risk * rr, -risk)
+        exit_price = np.where(is_win, entry + sign * risk * rr, entry - sign * risk)
+        stop_loss = np.where(is_win, entry - sign * risk, exit_price)
+        take_profit = np.where(is_win, exit_price, entry + sign * entry * 0.02)
+
+        gaps = rng.exponential(86400.0 / trades_per_day, k).astype("int64")
+        dates = current + pd.to_timedelta(np.cumsum(gaps), unit="s")
+        current = dates[-1]
+
+        yield pd.DataFrame({
+            "date": dates,
+            "market": pd.Categorical.from_codes(m_idx, markets),
+            "direction": pd.Categorical.from_codes((sign < 0).astype("int8"), DIRECTIONS),
+            "entry": entry.round(2),
+            "stop_loss": stop_loss.round(2),
+            "take_profit": take_profit.round(2),
+            "exit_price": exit_price.round(2),
+            "quantity": np.ones(k),
+            "pnl": pnl.round(2),
+            "notes": pd.Categorical.from_codes((~is_win).astype("int8"), NOTES)
         })
-        
-    df = pd.DataFrame(data)
-    mapping = {
-        'date': 'date', 'market': 'market', 'direction': 'direction', 
-        'entry': 'entry', 'stop_loss': 'stop_loss', 'take_profit': 'take_profit',
-        'exit_price': 'exit_price', 'quantity': 'quantity', 'pnl': 'pnl', 'notes': 'notes'
-    }
-    
+
+def make_sample_trades(n=100, seed=42, **kwargs):
+    """Build a dataframe of n synthetic trades."""
+    return pd.concat(generate_trades(n, seed=seed, **kwargs), ignore_index=True)
+
+def write_trades(chunks, fmt="db", path=None, bulk=True, batch_size=BULK_BATCH_SIZE):
+    """Stream generated chunks into a CSV file, a Parquet file or the trades database."""
+    writer = None
+    rows = 0
+    seen = {}
+    try:
+        for i, chunk in enumerate(chunks):
+            if fmt == "csv":
+                chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            elif fmt == "parquet":
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                save_trades_to_db(chunk, SAMPLE_MAPPING, bulk=bulk, batch_size=batch_size, seen=seen)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def generate_sample_trades(n=100, bulk=False, batch_size=BULK_BATCH_SIZE, fmt="db", path=None, **kwargs):
     print(f"Generating {n} trades...")
-    save_trades_to_db(df, mapping)
-    print("Sample database 'trades.db' created successfully!")
+    start = time.perf_counter()
+    rows = write_trades(generate_trades(n, **kwargs), fmt, path, bulk, batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows:,} rows in {elapsed:.2f}s ({rows / elapsed if elapsed > 0 else rows:,.0f} rows/sec)")
+    if fmt == "db":
+        print("Sample database 'trades.db' created successfully!")
+    else:
+        print(f"Sample trades written to '{path}'")
+
+def parse_market_mix(text):
+    """Parse "Bitcoin=2,Gold=1" into a market -> weight dict."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
 
 if __name__ == "__main__":
-    init_db()
-    generate_sample_trades(120)
+    parser = argparse.ArgumentParser(description="Generate synthetic trades into trades.db, a CSV or a Parquet file.")
+    parser.add_argument("-n", "--trades", type=int, default=120, help="number of trades to generate")
+    parser.add_argument("--format", choices=["db", "csv", "parquet"], default="db", help="output target")
+    parser.add_argument("-o", "--output", help="output path for csv/parquet")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="trades generated per chunk")
+    parser.add_argument("--win-rate", type=float, default=0.45, help="probability that a trade wins")
+    parser.add_argument("--trades-per-day", type=float, help="average trade frequency")
+    parser.add_argument("--markets", type=parse_market_mix, help='market mix, e.g. "Bitcoin=2,Gold=1"')
+    parser.add_argument("--bulk", action="store_true", help="use the batched bulk ingest path (db only)")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="rows per bulk insert batch")
+    args = parser.parse_args()
+
+    if args.format != "db" and not args.output:
+        parser.error("--output is required for csv and parquet")
+    if args.format == "db":
+        init_db()
+    generate_sample_trades(
+        args.trades, bulk=args.bulk, batch_size=args.batch_size, fmt=args.format, path=args.output,
+        seed=args.seed, chunk_size=args.chunk_size, market_mix=args.markets,
+        win_rate=args.win_rate, trades_per_day=args.trades_per_day
+    )
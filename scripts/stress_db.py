@@ -0,0 +1,168 @@
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Add parent directory to path to import src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from seed_db import make_sample_trades, SAMPLE_MAPPING
+
+MODES = ["queue", "direct"]
+
+def _percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+    ms = np.asarray(values) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+
+def run_worker(url, mode, writers, readers, batches, rows, seed, wal=True):
+    """Run writer and reader threads against one database from this process.
+
+    mode "queue" writes through the single-writer queue (submit_trades), "direct"
+    lets every thread insert on its own connection. Returns raw latencies and errors.
+    """
+    from src import database
+
+    pragmas = None if wal else dict(database.SQLITE_PRAGMAS, journal_mode="DELETE")
+    database.configure_engine(url, pragmas=pragmas)
+    database.init_db()
+
+    # Every insert is a distinct journal, so none of it is de-duplicated away
+    frames = [[make_sample_trades(rows, seed=(seed + i) * batches + b) for b in range(batches)]
+              for i in range(writers)]
+    write_times, read_times, errors = [], [], []
+    written = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write(batch_frames):
+        for frame in batch_frames:
+            start = time.perf_counter()
+            try:
+                if mode == "queue":
+                    database.submit_trades(frame, SAMPLE_MAPPING).result()
+                else:
+                    database._bulk_insert(database.to_db_frame(frame, SAMPLE_MAPPING), len(frame))
+            except Exception as e:
+                with lock:
+                    errors.append(f"write: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+                continue
+            with lock:
+                write_times.append(time.perf_counter() - start)
+                written[0] += len(frame)
+
+    def read(i):
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                if i % 2:
+                    database.summary_from_db()
+                else:
+                    database.query_trades(pnl_sign="win", limit=200)
+            except Exception as e:
+                with lock:
+                    errors.append(f"read: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+                continue
+            with lock:
+                read_times.append(time.perf_counter() - start)
+
+    write_threads = [threading.Thread(target=write, args=(f,)) for f in frames]
+    read_threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    start = time.perf_counter()
+    for t in read_threads + write_threads:
+        t.start()
+    for t in write_threads:
+        t.join()
+    done.set()
+    for t in read_threads:
+        t.join()
+    return {
+        "seconds": time.perf_counter() - start,
+        "written": written[0],
+        "write_times": write_times,
+        "read_times": read_times,
+        "errors": errors
+    }
+
+def stress(mode, writers=8, readers=4, batches=10, rows=500, processes=1, wal=True, workdir=None):
+    """Hammer a fresh SQLite file with concurrent writers and readers; return a summary."""
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'stress.db')}"
+        args = (url, mode, writers, readers, batches, rows)
+        from src import database
+        # Create the schema up front so worker processes do not race on CREATE TABLE
+        database.configure_engine(url)
+        database.init_db()
+        database.get_engine().dispose()
+        start = time.perf_counter()
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn")) as pool:
+                parts = list(pool.map(run_worker, *zip(*[args + (p * writers, wal) for p in range(processes)])))
+        else:
+            parts = [run_worker(*args, seed=0, wal=wal)]
+        elapsed = time.perf_counter() - start
+
+        database.configure_engine(url)
+        stored = int(database.summary_from_db().get("total_trades", 0))
+        database.get_engine().dispose()
+
+    written = sum(p["written"] for p in parts)
+    errors = [e for p in parts for e in p["errors"]]
+    return {
+        "mode": mode,
+        "wal": wal,
+        "processes": processes,
+        "writers": writers * processes,
+        "readers": readers * processes,
+        "seconds": elapsed,
+        "rows_written": written,
+        "rows_stored": stored,
+        "consistent": stored == written,
+        "rows_per_sec": written / elapsed if elapsed > 0 else float(written),
+        "reads": sum(len(p["read_times"]) for p in parts),
+        "write_latency": _percentiles([t for p in parts for t in p["write_times"]]),
+        "read_latency": _percentiles([t for p in parts for t in p["read_times"]]),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write stress test for the SQLite trade store.")
+    parser.add_argument("--mode", choices=MODES + ["both"], default="both", help="write path to exercise")
+    parser.add_argument("--writers", type=int, default=8, help="writer threads per process")
+    parser.add_argument("--readers", type=int, default=4, help="reader threads per process")
+    parser.add_argument("--batches", type=int, default=10, help="inserts per writer")
+    parser.add_argument("--rows", type=int, default=500, help="trades per insert")
+    parser.add_argument("--processes", type=int, default=1, help="processes sharing the database file")
+    parser.add_argument("--no-wal", action="store_true", help="use the rollback journal instead of WAL")
+    parser.add_argument("--output", help="write the JSON results here")
+    args = parser.parse_args()
+
+    modes = MODES if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        r = stress(mode, args.writers, args.readers, args.batches, args.rows, args.processes, not args.no_wal)
+        results.append(r)
+        print(f"{mode:<7} {r['seconds']:>7.2f}s {r['rows_per_sec']:>10,.0f} rows/s  "
+              f"write p95 {r['write_latency']['p95_ms'] or 0:>8.1f} ms  "
+              f"read p95 {r['read_latency']['p95_ms'] or 0:>8.1f} ms  "
+              f"reads {r['reads']:>6}  errors {r['errors']}  consistent {r['consistent']}")
+        for sample in r["error_samples"]:
+            print(f"    {sample}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if any(r["errors"] or not r["consistent"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
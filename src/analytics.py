@@ -1,13 +1,151 @@
 import pandas as pd
 import numpy as np
+from src.data_processor import as_numeric, as_datetime, pnl_values
+from src.profiling import timed
 
+# Default trade-count window for rolling metrics
+ROLLING_WINDOW = 20
+# Trades compared at each end of the seen prefix when checking that a frame extends an accumulator
+EXTENDS_CHECK = 32
+
+def _run_boundaries(win, groups=None):
+    """Start offsets and lengths of runs of equal outcome (and group) in a boolean array."""
+    n = len(win)
+    breaks = np.ones(n, dtype=bool)
+    breaks[1:] = win[1:] != win[:-1]
+    if groups is not None:
+        breaks[1:] |= groups[1:] != groups[:-1]
+    starts = np.flatnonzero(breaks)
+    lengths = np.diff(np.append(starts, n))
+    return starts, lengths
+
+def streak_runs(pnl, groups=None):
+    """Return every win/loss run as (is_win, start, length, pnl) in one vectorized pass.
+
+    start is the positional offset of the run's first trade. When groups is given,
+    runs are computed within each group (in original trade order) and a group column
+    is added.
+    """
+    pnl = np.asarray(as_numeric(pd.Series(pnl)), dtype=float)
+    pnl = np.where(np.isnan(pnl), 0.0, pnl)
+    if len(pnl) == 0:
+        return pd.DataFrame({"is_win": np.empty(0, dtype=bool), "start": np.empty(0, dtype=int),
+                             "length": np.empty(0, dtype=int), "pnl": np.empty(0)})
+
+    order = None
+    codes = None
+    if groups is not None:
+        codes, uniques = pd.factorize(pd.Series(groups), use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        pnl = pnl[order]
+
+    win = pnl > 0
+    starts, lengths = _run_boundaries(win, codes)
+    runs = pd.DataFrame({
+        "is_win": win[starts],
+        "start": starts if order is None else order[starts],
+        "length": lengths,
+        "pnl": np.add.reduceat(pnl, starts)
+    })
+    if order is not None:
+        runs.insert(0, "group", np.asarray(uniques, dtype=object)[codes[starts]])
+    return runs
+
+def _summarize_runs(is_win, lengths):
+    """Longest and average win/loss streak from run outcomes and lengths."""
+    win_lengths = lengths[is_win]
+    loss_lengths = lengths[~is_win]
+    return {
+        "longest_win_streak": int(win_lengths.max()) if win_lengths.size else 0,
+        "longest_loss_streak": int(loss_lengths.max()) if loss_lengths.size else 0,
+        "avg_win_streak": float(win_lengths.mean()) if win_lengths.size else 0.0,
+        "avg_loss_streak": float(loss_lengths.mean()) if loss_lengths.size else 0.0
+    }
+
+def streak_stats(df, resolved, by=None):
+    """Streak statistics overall or per market/direction, from a single groupby over the runs.
+
+    by may be a standard field name ("market", "direction") or a list of them.
+    """
+    if "pnl" not in resolved:
+        return None
+
+    pnl = df[resolved["pnl"]]
+    groups = None
+    keys = []
+    if by is not None:
+        keys = [by] if isinstance(by, str) else list(by)
+        cols = [resolved[k] for k in keys if k in resolved and resolved[k] in df.columns]
+        if len(cols) != len(keys):
+            return None
+        groups = pd.Series(list(zip(*(df[c] for c in cols)))) if len(cols) > 1 else df[cols[0]]
+
+    runs = streak_runs(pnl, groups)
+    if groups is None:
+        runs.insert(0, "group", "All")
+    runs["kind"] = np.where(runs["is_win"], "win", "loss")
+
+    stats = runs.groupby(["group", "kind"]).agg(
+        streaks=("length", "count"),
+        longest_streak=("length", "max"),
+        avg_streak=("length", "mean"),
+        avg_streak_pnl=("pnl", "mean"),
+        best_streak_pnl=("pnl", "max"),
+        worst_streak_pnl=("pnl", "min")
+    ).unstack("kind")
+    names = {
+        "streaks": "{}_streaks", "longest_streak": "longest_{}_streak", "avg_streak": "avg_{}_streak",
+        "avg_streak_pnl": "avg_{}_streak_pnl", "best_streak_pnl": "best_{}_streak_pnl",
+        "worst_streak_pnl": "worst_{}_streak_pnl"
+    }
+    stats = stats.reindex(columns=pd.MultiIndex.from_product([list(names), ["win", "loss"]]))
+    stats.columns = [names[stat].format(kind) for stat, kind in stats.columns]
+    for col in ["win_streaks", "loss_streaks", "longest_win_streak", "longest_loss_streak"]:
+        stats[col] = stats[col].fillna(0).astype(int)
+
+    if len(keys) > 1:
+        stats.index = pd.MultiIndex.from_tuples(stats.index, names=keys)
+    else:
+        stats.index.name = keys[0] if keys else None
+    return stats
+
+def _build_metrics(total_trades, wins, losses, avg_win, avg_loss, gross_profit, gross_loss,
+                   mean_return, std_return, max_drawdown, streaks, avg_rr,
+                   pnl_series, equity):
+    """Derive the KPI dict from the aggregate statistics of a PnL series."""
+    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0.0
+    expectancy = (win_rate/100 * avg_win) - ((100 - win_rate)/100 * avg_loss)
+    profit_factor = gross_profit / (gross_loss or 1e-9)
+    sharpe = mean_return / (std_return or 1e-9)
+
+    return {
+        "total_trades": total_trades,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": win_rate,
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "expectancy": expectancy,
+        "profit_factor": profit_factor,
+        "sharpe": sharpe,
+        "max_drawdown": max_drawdown,
+        "longest_win_streak": streaks["longest_win_streak"],
+        "longest_loss_streak": streaks["longest_loss_streak"],
+        "avg_win_streak": streaks["avg_win_streak"],
+        "avg_loss_streak": streaks["avg_loss_streak"],
+        "avg_rr": avg_rr,
+        "pnl_series": pnl_series,
+        "equity": equity
+    }
+
+@timed()
 def calculate_metrics(df, resolved):
     """Calculate all trading performance metrics."""
     if "pnl" not in resolved:
         return None
 
-    pnl_col = resolved["pnl"]
-    pnl_series = pd.to_numeric(df[pnl_col], errors="coerce").fillna(0)
+    pnl_series = pnl_values(df, resolved)
 
     total_trades = int(pnl_series.size)
     wins_mask = pnl_series > 0
@@ -15,68 +153,339 @@ def calculate_metrics(df, resolved):
     wins = int(wins_mask.sum())
     losses = int(losses_mask.sum())
     
-    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0.0
     avg_win = pnl_series[wins_mask].mean() if wins > 0 else 0.0
     avg_loss = abs(pnl_series[losses_mask].mean()) if losses > 0 else 0.0
-    expectancy = (win_rate/100 * avg_win) - ((100 - win_rate)/100 * avg_loss)
-    
     gross_profit = pnl_series[pnl_series > 0].sum()
-    gross_loss = abs(pnl_series[pnl_series < 0].sum()) or 1e-9
-    profit_factor = gross_profit / gross_loss
-    
-    mean_return = pnl_series.mean()
-    std_return = pnl_series.std(ddof=0) or 1e-9
-    sharpe = mean_return / std_return
+    gross_loss = abs(pnl_series[pnl_series < 0].sum())
     
     equity = pnl_series.cumsum()
     peak = equity.cummax()
     drawdown = (equity - peak)
     max_drawdown = drawdown.min()
 
-    def longest_streak(mask):
-        max_s = cur = 0
-        for v in mask:
-            if v:
-                cur += 1
-                max_s = max(max_s, cur)
-            else:
-                cur = 0
-        return max_s
-
-    longest_win_streak = longest_streak(wins_mask)
-    longest_loss_streak = longest_streak(~wins_mask)
+    runs = streak_runs(pnl_series)
+    streaks = _summarize_runs(runs["is_win"].to_numpy(), runs["length"].to_numpy())
 
     avg_rr = None
     if "risk_reward" in resolved:
         try:
-            avg_rr = float(pd.to_numeric(df[resolved["risk_reward"]], errors="coerce").dropna().mean())
+            avg_rr = float(as_numeric(df[resolved["risk_reward"]]).dropna().mean())
         except Exception:
             avg_rr = None
 
-    return {
-        "total_trades": total_trades,
-        "wins": wins,
-        "losses": losses,
-        "win_rate": win_rate,
-        "avg_win": avg_win,
-        "avg_loss": avg_loss,
-        "expectancy": expectancy,
-        "profit_factor": profit_factor,
-        "sharpe": sharpe,
-        "max_drawdown": max_drawdown,
-        "longest_win_streak": longest_win_streak,
-        "longest_loss_streak": longest_loss_streak,
-        "avg_rr": avg_rr,
-        "pnl_series": pnl_series,
-        "equity": equity
-    }
+    return _build_metrics(
+        total_trades, wins, losses, avg_win, avg_loss, gross_profit, gross_loss,
+        pnl_series.mean(), pnl_series.std(ddof=0), max_drawdown,
+        streaks, avg_rr, pnl_series, equity
+    )
+
+def _window_starts(n, window, dates=None):
+    """First position of the window ending at each trade: the last `window` trades, or (t - window, t] in time."""
+    if dates is None:
+        return np.maximum(np.arange(n) - window + 1, 0)
+    values = dates.to_numpy(dtype="datetime64[ns]")
+    return np.searchsorted(values, values - pd.Timedelta(window).to_timedelta64(), side="right")
+
+@timed()
+def rolling_metrics(df, resolved, window=ROLLING_WINDOW, min_periods=None):
+    """Rolling win rate, expectancy, profit factor and Sharpe in one O(n) pass.
+
+    window is a trade count (int) or a time span on the resolved date column
+    ("30D", "12h"); time windows are evaluated in date order and indexed by date.
+    Every statistic is a difference of prefix sums, so the cost does not grow with
+    the window. Rows with fewer than min_periods trades (default: window for count
+    windows, 1 for time windows) are NaN, as are profit factor and Sharpe
+    for windows with no losses or zero spread.
+    """
+    if "pnl" not in resolved:
+        return None
+
+    pnl = pnl_values(df, resolved)
+    dates = None
+    if isinstance(window, (int, np.integer)):
+        if window < 1:
+            raise ValueError(f"window must be positive, got {window}")
+        min_periods = window if min_periods is None else min_periods
+        index = df.index
+    else:
+        if resolved.get("date") not in df.columns:
+            return None
+        dates = as_datetime(df[resolved["date"]])
+        order = np.argsort(dates.to_numpy(dtype="datetime64[ns]"), kind="stable")
+        dates, pnl = dates.iloc[order], pnl.iloc[order]
+        valid = dates.notna().to_numpy()
+        dates, pnl = dates[valid], pnl[valid]
+        min_periods = 1 if min_periods is None else min_periods
+        index = pd.DatetimeIndex(dates, name=resolved["date"])
+
+    values = pnl.to_numpy(dtype=float)
+    n = len(values)
+    # Centering keeps the sum-of-squares difference numerically stable
+    centered = values - (values.mean() if n else 0.0)
+    stacked = np.column_stack([
+        np.ones(n), values > 0, values, np.where(values > 0, values, 0.0),
+        np.where(values < 0, -values, 0.0), centered, centered * centered
+    ])
+    prefix = np.vstack([np.zeros(7), np.cumsum(stacked, axis=0)])
+    starts = _window_starts(n, window, dates)
+    sums = prefix[1:] - prefix[starts]
+    count, wins, total, gross_profit, gross_loss, c_sum, c_sq = sums.T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / count
+        std = np.sqrt(np.clip(c_sq / count - (c_sum / count) ** 2, 0, None))
+        out = pd.DataFrame({
+            "trades": count.astype(int),
+            "pnl": total,
+            "win_rate": wins / count * 100,
+            # Same as win_rate * avg_win - loss_rate * avg_loss
+            "expectancy": mean,
+            # Undefined (NaN) for windows without losses or without dispersion
+            "profit_factor": np.where(gross_loss > 0, gross_profit / gross_loss, np.nan),
+            "sharpe": np.where(std > 1e-9 * np.maximum(np.abs(mean), 1.0), mean / std, np.nan)
+        }, index=index)
+    out.loc[count < min_periods, out.columns[1:]] = np.nan
+    return out
+
+def _top_positions(values, n, largest=True):
+    """Positions of the n largest (or smallest) non-NaN values, best first, via argpartition."""
+    valid = np.flatnonzero(~np.isnan(values))
+    keyed = -values[valid] if largest else values[valid]
+    if n < keyed.size:
+        part = np.argpartition(keyed, n - 1)[:n]
+    else:
+        part = np.arange(keyed.size)
+    return valid[part[np.argsort(keyed[part], kind="stable")]]
+
+def _group_keys(df, resolved, by):
+    """Group labels for "market", "direction" or "month" (from the resolved date column)."""
+    if by == "month":
+        return as_datetime(df[resolved["date"]]).dt.to_period("M")
+    return df[resolved[by]]
+
+def top_n_trades(df, resolved, n=5, largest=True, by=None):
+    """Top n trades by PnL, overall or per market/direction/month.
+
+    Overall selection is O(n) with argpartition; grouped selection ranks PnL within
+    every group in a single groupby pass. The PnL used is added as a _pnl column.
+    """
+    if "pnl" not in resolved:
+        return None
+    pnl = as_numeric(df[resolved["pnl"]]).to_numpy(dtype=float)
+
+    if by is None:
+        pos = _top_positions(pnl, n, largest)
+        return df.iloc[pos].assign(_pnl=pnl[pos])
 
+    if resolved.get("date" if by == "month" else by) not in df.columns:
+        return None
+    keys = pd.Series(np.asarray(_group_keys(df, resolved, by)), index=df.index)
+    rank = pd.Series(pnl, index=df.index).groupby(keys, sort=False).rank(method="first", ascending=not largest)
+    top = df[(rank <= n).to_numpy()].assign(_pnl=pnl[(rank <= n).to_numpy()], _group=keys[rank <= n])
+    return top.sort_values(["_group", "_pnl"], ascending=[True, not largest], kind="stable")
+
+@timed()
 def get_best_worst_trades(df, resolved, n=5):
     """Get Top N winning and losing trades."""
     if "pnl" not in resolved:
         return None, None
-        
-    pnl_col = resolved["pnl"]
-    best = df.assign(_pnl=pd.to_numeric(df[pnl_col], errors="coerce")).sort_values("_pnl", ascending=False).head(n)
-    worst = df.assign(_pnl=pd.to_numeric(df[pnl_col], errors="coerce")).sort_values("_pnl").head(n)
-    return best, worst
+    return top_n_trades(df, resolved, n, largest=True), top_n_trades(df, resolved, n, largest=False)
+
+class IncrementalMetrics:
+    """Running accumulator that keeps calculate_metrics results current as trades are appended.
+
+    Each update(new_trades, resolved) costs O(k) in the number of new trades; metrics()
+    returns the same dict as calculate_metrics over everything seen so far.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.losses = 0
+        self.sum_wins = 0.0
+        self.sum_losses = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.last_equity = 0.0
+        self.peak = -np.inf
+        self.max_drawdown = np.nan
+        self.cur_win_streak = 0
+        self.cur_loss_streak = 0
+        self.longest_win_streak = 0
+        self.longest_loss_streak = 0
+        self.win_runs = 0
+        self.loss_runs = 0
+        self.has_rr = False
+        self.rr_sum = 0.0
+        self.rr_count = 0
+        self._pnl = np.empty(0)
+        self._equity = np.empty(0)
+        self._rr = np.empty(0)
+        self._resolved = None
+
+    def _append(self, buf, values):
+        """Append to a growable buffer, doubling capacity when full."""
+        needed = self.count + len(values)
+        if needed > len(buf):
+            grown = np.empty(max(needed, 2 * len(buf), 1024))
+            grown[:self.count] = buf[:self.count]
+            buf = grown
+        buf[self.count:needed] = values
+        return buf
+
+    def update(self, new_trades, resolved):
+        """Fold a frame of newly appended trades into the running state."""
+        if "pnl" not in resolved:
+            return self
+        self._resolved = dict(resolved)
+        # Like calculate_metrics, a mapped R:R column gives avg_rr (NaN until it has values)
+        self.has_rr = self.has_rr or "risk_reward" in resolved
+
+        pnl = pnl_values(new_trades, resolved).to_numpy(dtype=float)
+        k = len(pnl)
+        if k == 0:
+            return self
+
+        win = pnl > 0
+        k_wins = int(win.sum())
+        self.wins += k_wins
+        self.losses += k - k_wins
+        self.sum_wins += float(pnl[win].sum())
+        self.sum_losses += float(pnl[~win].sum())
+
+        # Chan et al. parallel merge of mean / sum of squared deviations
+        k_mean = float(pnl.mean())
+        k_m2 = float(((pnl - k_mean) ** 2).sum())
+        total = self.count + k
+        delta = k_mean - self.mean
+        self.m2 += k_m2 + delta * delta * self.count * k / total
+        self.mean += delta * k / total
+
+        equity = self.last_equity + np.cumsum(pnl)
+        peaks = np.maximum.accumulate(np.concatenate(([self.peak], equity)))[1:]
+        chunk_dd = float((equity - peaks).min())
+        self.max_drawdown = chunk_dd if np.isnan(self.max_drawdown) else min(self.max_drawdown, chunk_dd)
+        self.peak = float(peaks[-1])
+        self.last_equity = float(equity[-1])
+
+        starts, lengths = _run_boundaries(win)
+        run_wins = win[starts]
+        # The first run of the chunk continues whatever streak was open before it
+        if run_wins[0] and self.cur_win_streak:
+            lengths[0] += self.cur_win_streak
+            self.win_runs -= 1
+        elif not run_wins[0] and self.cur_loss_streak:
+            lengths[0] += self.cur_loss_streak
+            self.loss_runs -= 1
+        chunk = _summarize_runs(run_wins, lengths)
+        self.longest_win_streak = max(self.longest_win_streak, chunk["longest_win_streak"])
+        self.longest_loss_streak = max(self.longest_loss_streak, chunk["longest_loss_streak"])
+        self.win_runs += int(run_wins.sum())
+        self.loss_runs += int((~run_wins).sum())
+        self.cur_win_streak = int(lengths[-1]) if run_wins[-1] else 0
+        self.cur_loss_streak = 0 if run_wins[-1] else int(lengths[-1])
+
+        rr = np.full(k, np.nan)
+        if "risk_reward" in resolved:
+            rr = as_numeric(new_trades[resolved["risk_reward"]]).to_numpy(dtype=float, na_value=np.nan)
+            seen = ~np.isnan(rr)
+            self.rr_sum += float(rr[seen].sum())
+            self.rr_count += int(seen.sum())
+
+        self._pnl = self._append(self._pnl, pnl)
+        self._rr = self._append(self._rr, rr)
+        self._equity = self._append(self._equity, equity)
+        self.count = total
+        return self
+
+    def extends(self, df, resolved, pnl=None):
+        """Whether df holds the trades folded in so far, possibly followed by new ones.
+
+        Only the first and last EXTENDS_CHECK seen trades are compared, so the check
+        stays O(1) as the journal grows; an edit in the middle goes unnoticed.
+        """
+        if self._resolved != dict(resolved) or len(df) < self.count:
+            return False
+        pos = np.unique(np.r_[:min(EXTENDS_CHECK, self.count), max(self.count - EXTENDS_CHECK, 0):self.count])
+        pnl = pnl_values(df.iloc[pos], resolved) if pnl is None else pnl.iloc[pos]
+        if not np.array_equal(pnl.to_numpy(dtype=float), self._pnl[pos], equal_nan=True):
+            return False
+        if "risk_reward" in resolved:
+            rr = as_numeric(df[resolved["risk_reward"]].iloc[pos]).to_numpy(dtype=float, na_value=np.nan)
+            return np.array_equal(rr, self._rr[pos], equal_nan=True)
+        return True
+
+    def metrics(self):
+        """Return the KPI dict for all trades seen so far."""
+        n = self.count
+        pnl_series = pd.Series(self._pnl[:n], dtype=float)
+        equity = pd.Series(self._equity[:n], dtype=float)
+        avg_rr = None
+        if self.has_rr:
+            avg_rr = self.rr_sum / self.rr_count if self.rr_count else float("nan")
+
+        return _build_metrics(
+            n, self.wins, self.losses,
+            self.sum_wins / self.wins if self.wins > 0 else 0.0,
+            abs(self.sum_losses / self.losses) if self.losses > 0 else 0.0,
+            self.sum_wins, abs(self.sum_losses),
+            self.mean if n else float("nan"),
+            float(np.sqrt(self.m2 / n)) if n else float("nan"),
+            self.max_drawdown,
+            {
+                "longest_win_streak": self.longest_win_streak,
+                "longest_loss_streak": self.longest_loss_streak,
+                "avg_win_streak": self.wins / self.win_runs if self.win_runs else 0.0,
+                "avg_loss_streak": self.losses / self.loss_runs if self.loss_runs else 0.0
+            },
+            avg_rr, pnl_series, equity
+        )
+
+    def to_state(self):
+        """Serialize the accumulator to a JSON-compatible dict."""
+        state = {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+        state = {k: (None if isinstance(v, float) and not np.isfinite(v) else v) for k, v in state.items()}
+        state["pnl"] = self._pnl[:self.count].tolist()
+        state["equity"] = self._equity[:self.count].tolist()
+        state["rr"] = [None if np.isnan(v) else v for v in self._rr[:self.count].tolist()]
+        # The mapping is what extends() checks first; without it a restored accumulator never appends
+        state["resolved"] = self._resolved
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an accumulator from the output of to_state()."""
+        acc = cls()
+        for k, v in state.items():
+            if k in ("pnl", "equity", "rr", "resolved"):
+                continue
+            setattr(acc, k, v)
+        if acc.peak is None:
+            acc.peak = -np.inf
+        if acc.max_drawdown is None:
+            acc.max_drawdown = np.nan
+        acc._pnl = np.asarray(state.get("pnl", []), dtype=float)
+        acc._equity = np.asarray(state.get("equity", []), dtype=float)
+        acc._rr = np.asarray(state.get("rr", [None] * acc.count), dtype=float)
+        acc._resolved = state.get("resolved")
+        return acc
+
+@timed()
+def append_metrics(acc, df, resolved):
+    """calculate_metrics(df, resolved) through an IncrementalMetrics accumulator.
+
+    When df is the trades acc has already seen with new ones appended (same mapping,
+    same earlier PnL), only the new trades are folded in; otherwise a fresh
+    accumulator is built. Returns (metrics, acc).
+    """
+    if "pnl" not in resolved:
+        return None, acc
+    pnl = pnl_values(df, resolved)
+    if acc is None or not acc.extends(df, resolved, pnl):
+        acc = IncrementalMetrics()
+    acc.update(df.iloc[acc.count:], resolved)
+    metrics = acc.metrics()
+    # Same series objects as calculate_metrics, aligned with df for the charts
+    metrics["pnl_series"] = pnl
+    metrics["equity"] = pd.Series(metrics["equity"].to_numpy(), index=pnl.index, name=pnl.name)
+    return metrics, acc
@@ -0,0 +1,417 @@
+import gc
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.profiling import timed
+
+LEADERBOARD_COLUMNS = [
+    "total_trades", "win_rate", "total_pnl", "expectancy", "profit_factor", "sharpe",
+    "max_drawdown", "avg_win", "avg_loss", "longest_loss_streak"
+]
+# The portfolio equity curve sums every journal's PnL per period of this frequency
+PORTFOLIO_FREQ = "D"
+MANIFEST_NAME = "manifest.json"
+# Bump when report contents change so every journal is rebuilt once
+REPORT_VERSION = 1
+
+def journals_from_dir(path, pattern="*.csv"):
+    """Map file stems to the journal files (CSV or Parquet) in a directory."""
+    files = sorted(glob.glob(os.path.join(path, pattern)))
+    return {os.path.splitext(os.path.basename(f))[0]: f for f in files}
+
+def journals_from_store(by="market", backend=None, **filters):
+    """Split the saved journal into one journal per value of a stored column (market or direction)."""
+    from src.storage import load_trades
+
+    df = load_trades(backend=backend, **filters)
+    if df.empty:
+        return {}
+    return {str(key): group.reset_index(drop=True) for key, group in df.groupby(by, sort=True)}
+
+def _load_source(source):
+    """A raw journal frame from a CSV or Parquet path."""
+    if str(source).lower().endswith(".parquet"):
+        return pd.read_parquet(source)
+    from src.data_processor import load_csv
+    with open(source, "rb") as f:
+        return load_csv(f)
+
+def _analyze(raw, breakdown=None, charts=False, freq=PORTFOLIO_FREQ):
+    """Metrics, PnL per period and optional breakdown/charts for one raw journal."""
+    from src.data_processor import process_data, as_datetime
+    from src.analytics import calculate_metrics
+
+    df, resolved = process_data(raw)
+    metrics = calculate_metrics(df, resolved)
+    if metrics is None:
+        raise ValueError("no PnL column (or entry, exit and quantity to compute it)")
+    pnl = metrics["pnl_series"]
+    row = {k: metrics[k] for k in LEADERBOARD_COLUMNS if k in metrics}
+    row["total_pnl"] = float(pnl.sum())
+
+    period_pnl = None
+    if resolved.get("date") in df.columns:
+        dates = as_datetime(df[resolved["date"]])
+        known = dates.notna().to_numpy()
+        if known.any():
+            period_pnl = pd.Series(pnl.to_numpy()[known], index=dates[known].to_numpy()).resample(freq).sum()
+
+    out = {"metrics": row, "period_pnl": period_pnl, "breakdown": None, "charts": None}
+    if breakdown:
+        from src.cube import TradeCube
+        out["breakdown"] = TradeCube.from_trades(df, resolved).rollup(breakdown)
+    if charts:
+        from src.visualizer import render_charts
+        rendered = render_charts(df, resolved, metrics, parallel=False)
+        out["charts"] = {name: c["png"] for name, c in rendered.items() if c["png"]}
+    return out
+
+def _to_arrow(df):
+    import pyarrow as pa
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type object columns (raw CSV text) travel as strings; process_data re-parses them
+        mixed = {c: str for c in df.columns if df[c].dtype == object}
+        return pa.Table.from_pandas(df.astype(mixed), preserve_index=False)
+
+def _share_frames(frames):
+    """Write dataframes as Arrow IPC streams into one shared memory block.
+
+    Returns the block and {name: (block name, offset, size)}; workers read their
+    slice in place, so no dataframe is pickled.
+    """
+    import pyarrow as pa
+
+    tables = {name: _to_arrow(df) for name, df in frames.items()}
+    sizes = {}
+    for name, table in tables.items():
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        sizes[name] = sink.size()
+
+    block = shared_memory.SharedMemory(create=True, size=max(sum(sizes.values()), 1))
+    refs = {}
+    offset = 0
+    try:
+        for name, table in tables.items():
+            view = block.buf[offset:offset + sizes[name]]
+            buf = pa.py_buffer(view)
+            sink = pa.FixedSizeBufferWriter(buf)
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            sink.close()
+            # Every export of the block must be dropped before it can be closed
+            del writer, sink, buf
+            view.release()
+            refs[name] = (block.name, offset, sizes[name])
+            offset += sizes[name]
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    return block, refs
+
+@contextmanager
+def _journal(kind, ref):
+    """The raw frame of one journal task: a frame, a path to load or a shared memory slice.
+
+    A shared frame is read in place, so its numeric columns point straight into the
+    block: it must not outlive the with block, and only the derived results of
+    _analyze leave it.
+    """
+    if kind != "shared":
+        yield _load_source(ref) if kind == "path" else ref
+        return
+    import pyarrow as pa
+
+    block_name, offset, size = ref
+    block = shared_memory.SharedMemory(name=block_name)
+    view = block.buf[offset:offset + size]
+    buf = pa.py_buffer(view)
+    table = pa.ipc.open_stream(buf).read_all()
+    df = table.to_pandas()
+    try:
+        yield df
+    finally:
+        del df, table, buf
+        gc.collect()
+        view.release()
+        block.close()
+
+def _run_task(name, kind, ref, breakdown, charts, freq):
+    """Worker entry point: load one journal (shared memory, path or frame) and analyze it."""
+    try:
+        with _journal(kind, ref) as raw:
+            result = _analyze(raw, breakdown, charts, freq)
+            del raw
+        return dict(result, name=name, error=None)
+    except Exception as e:
+        return {"name": name, "error": f"{e.__class__.__name__}: {e}"}
+
+def _dispatch(items, task, args, workers=None, progress=None):
+    """Run task(name, kind, ref, *args) for every (name, source) pair, in parallel when workers > 1.
+
+    Dataframes reach spawned workers through one shared memory block of Arrow IPC
+    streams, paths are opened by the workers. progress(done, total, result) is called
+    as each task finishes; results come back in input order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(items))
+    total = len(items)
+
+    if workers <= 1:
+        results = []
+        for name, src in items:
+            frame = isinstance(src, pd.DataFrame)
+            results.append(task(name, "frame" if frame else "path", src if frame else os.fspath(src), *args))
+            if progress:
+                progress(len(results), total, results[-1])
+        return results
+
+    frames = {name: src for name, src in items if isinstance(src, pd.DataFrame)}
+    block, refs = _share_frames(frames) if frames else (None, {})
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [
+                pool.submit(task, name, "shared", refs[name], *args) if name in refs
+                else pool.submit(task, name, "path", os.fspath(src), *args)
+                for name, src in items
+            ]
+            if progress:
+                for done, future in enumerate(as_completed(futures), 1):
+                    progress(done, total, future.result())
+            return [f.result() for f in futures]
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+def _leaderboard(rows, sort_by):
+    """Ranked leaderboard from {journal name: metrics row}."""
+    leaderboard = pd.DataFrame(list(rows.values()), index=pd.Index(list(rows), name="journal"),
+                               columns=LEADERBOARD_COLUMNS)
+    if not leaderboard.empty:
+        leaderboard = leaderboard.sort_values(sort_by, ascending=False, kind="stable")
+        leaderboard.insert(0, "rank", range(1, len(leaderboard) + 1))
+    return leaderboard
+
+def _consolidate(results, sort_by):
+    """Leaderboard, portfolio equity curve and per-journal details from the worker results."""
+    ok = [r for r in results if r["error"] is None]
+    leaderboard = _leaderboard({r["name"]: r["metrics"] for r in ok}, sort_by)
+
+    series = {r["name"]: r["period_pnl"] for r in ok if r["period_pnl"] is not None}
+    if series:
+        period_pnl = pd.concat(series, axis=1).fillna(0.0)
+        period_pnl.index.name = "period"
+        equity = period_pnl.sum(axis=1).cumsum()
+        portfolio = pd.DataFrame({"pnl": period_pnl.sum(axis=1), "equity": equity,
+                                  "drawdown": equity - equity.cummax()})
+    else:
+        period_pnl = pd.DataFrame()
+        portfolio = pd.DataFrame(columns=["pnl", "equity", "drawdown"])
+
+    return {
+        "leaderboard": leaderboard,
+        "portfolio": portfolio,
+        "period_pnl": period_pnl,
+        "journals": {r["name"]: {k: r[k] for k in ("metrics", "breakdown", "charts")} for r in ok},
+        "errors": {r["name"]: r["error"] for r in results if r["error"] is not None}
+    }
+
+@timed()
+def analyze_journals(journals, workers=None, breakdown=None, charts=False, freq=PORTFOLIO_FREQ,
+                     sort_by="total_pnl"):
+    """Analyze many journals in parallel and consolidate them.
+
+    journals maps a name to a CSV/Parquet path or a raw dataframe (see journals_from_dir
+    and journals_from_store). Each journal is processed and measured in a worker
+    process; dataframes reach the workers through one shared memory block of Arrow
+    IPC streams and paths are read by the workers themselves. breakdown (a TradeCube
+    dimension) and charts=True add per-journal roll-ups and PNG charts.
+
+    Returns {"leaderboard", "portfolio", "period_pnl", "journals", "errors"}: the
+    leaderboard ranks journals by sort_by, portfolio holds the summed PnL, equity and
+    drawdown per freq period of every dated journal, and journals that fail are
+    reported in errors instead of aborting the batch.
+    """
+    results = _dispatch(list(journals.items()), _run_task, (breakdown, charts, freq), workers)
+    return _consolidate(results, sort_by)
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]+", "_", str(name)).strip("_") or "journal"
+
+def _file_hash(path, chunk_bytes=1024 ** 2):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _jsonable(value):
+    """Plain JSON values from metric dicts (numpy scalars, timestamps, durations, NaN)."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (np.timedelta64, np.datetime64)):
+        value = pd.Timedelta(value) if isinstance(value, np.timedelta64) else pd.Timestamp(value)
+        if value is pd.NaT:
+            return None
+    if isinstance(value, pd.Timedelta):
+        return value.total_seconds() / 86400
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _build_report(raw, name, options):
+    """PDF bytes and the JSON summary for one raw journal."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from src.data_processor import process_data
+    from src.analytics import calculate_metrics
+    from src.visualizer import render_charts, plot_simulation, fig_to_png
+    from src.simulation import simulate_paths
+    from src.timeseries import time_metrics
+    from src.reporter import build_report
+
+    df, resolved = process_data(raw)
+    metrics = calculate_metrics(df, resolved)
+    if metrics is None:
+        raise ValueError("no PnL column (or entry, exit and quantity to compute it)")
+    charts = render_charts(df, resolved, metrics, parallel=False)
+    images = [c["png"] for c in charts.values() if c["png"]]
+    sim = None
+    if options["sim_paths"]:
+        sim = simulate_paths(metrics["pnl_series"], options["sim_paths"])
+        images.append(fig_to_png(plot_simulation(sim)))
+    pdf = build_report(df, resolved, metrics, images, sim)
+
+    summary = {
+        "journal": name,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "metrics": {k: v for k, v in metrics.items() if k not in ("pnl_series", "equity")},
+        "total_pnl": float(metrics["pnl_series"].sum())
+    }
+    tm = time_metrics(df, resolved, options["freq"]) if resolved.get("date") in df.columns else None
+    if tm is not None:
+        summary["time_metrics"] = {k: v for k, v in tm.items() if k not in ("series", "drawdowns")}
+        summary["drawdowns"] = tm["drawdowns"].head(5).to_dict("records")
+    if sim is not None:
+        summary["simulation"] = {k: sim[k] for k in ("paths", "method", "final_equity_pct", "max_drawdown_pct", "prob_loss")}
+    return pdf, _jsonable(summary)
+
+def _report_task(name, kind, ref, output_dir, options):
+    """Worker entry point: build and write one journal's PDF and JSON summary."""
+    start = time.perf_counter()
+    try:
+        with _journal(kind, ref) as raw:
+            pdf, summary = _build_report(raw, name, options)
+            del raw
+        # Serialize first so a summary that cannot be written leaves no orphan PDF
+        text = json.dumps(summary, indent=2).encode()
+        base = os.path.join(output_dir, _safe_name(name))
+        _write_atomic(base + ".pdf", pdf)
+        _write_atomic(base + ".json", text)
+        row = dict(summary["metrics"], total_pnl=summary["total_pnl"])
+        return {"name": name, "error": None, "pdf": base + ".pdf", "json": base + ".json",
+                "metrics": {k: row.get(k) for k in LEADERBOARD_COLUMNS}, "seconds": time.perf_counter() - start}
+    except Exception as e:
+        return {"name": name, "error": f"{e.__class__.__name__}: {e}", "seconds": time.perf_counter() - start}
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+@timed()
+def write_reports(journals, output_dir, workers=None, force=False, sim_paths=0, freq=PORTFOLIO_FREQ,
+                  progress=None):
+    """Write a PDF report and a JSON summary per journal, skipping journals that have not changed.
+
+    journals is the same mapping analyze_journals takes. output_dir/manifest.json keeps
+    each journal's content hash (file bytes, or the frame fingerprint) together with
+    the report options; a journal whose hash, options and outputs are unchanged is
+    skipped. Files whose size and mtime match the manifest are not even re-read.
+    force=True rebuilds everything. leaderboard.csv is rewritten at the end over the
+    journals passed in that have a report, skipped ones included; manifest entries
+    from other runs are left out.
+
+    Returns {"processed", "skipped", "errors", "seconds"}; progress(done, total, result)
+    is called as each report finishes.
+    """
+    from src.cache import dataset_fingerprint
+
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path)
+    options = {"version": REPORT_VERSION, "sim_paths": sim_paths, "freq": freq}
+
+    todo, skipped = [], []
+    for name, src in journals.items():
+        entry = manifest.get(name) or {}
+        same_options = entry.get("options") == options
+        if isinstance(src, pd.DataFrame):
+            stat, digest = None, dataset_fingerprint(src)
+        else:
+            info = os.stat(src)
+            stat = [info.st_size, info.st_mtime_ns]
+            digest = entry["hash"] if same_options and entry.get("stat") == stat else _file_hash(src)
+        outputs = [entry.get("pdf"), entry.get("json")]
+        if (not force and same_options and entry.get("hash") == digest
+                and all(p and os.path.exists(p) for p in outputs)):
+            entry["stat"] = stat
+            skipped.append(name)
+            continue
+        todo.append((name, src, digest, stat))
+
+    results = _dispatch([(name, src) for name, src, _, _ in todo], _report_task, (output_dir, options),
+                        workers, progress)
+    errors = {}
+    for (name, src, digest, stat), result in zip(todo, results):
+        if result["error"] is not None:
+            errors[name] = result["error"]
+            continue
+        manifest[name] = {
+            "hash": digest, "stat": stat, "options": options,
+            "source": None if isinstance(src, pd.DataFrame) else os.fspath(src),
+            "pdf": result["pdf"], "json": result["json"], "metrics": result["metrics"],
+            "generated_at": datetime.now(timezone.utc).isoformat()
+        }
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
+
+    board = _leaderboard({name: manifest[name]["metrics"] for name in journals if name in manifest}, "total_pnl")
+    board.to_csv(os.path.join(output_dir, "leaderboard.csv"))
+    return {
+        "processed": [name for (name, *_), r in zip(todo, results) if r["error"] is None],
+        "skipped": skipped,
+        "errors": errors,
+        "seconds": time.perf_counter() - start
+    }
@@ -0,0 +1,111 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from src.data_processor import frame_memory_mb
+
+# Memory budget of the shared analysis cache, overridable with TRADETRACK_CACHE_MB
+CACHE_MB = float(os.environ.get("TRADETRACK_CACHE_MB", 1024))
+
+def estimate_bytes(value, _seen=None):
+    """Rough in-memory size of a cached value: frames, arrays, PNG bytes and containers of them."""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(frame_memory_mb(value) * 1024 ** 2)
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_bytes(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(v, seen) for v in value)
+    if type(value).__module__.startswith("src."):
+        # Our own objects such as TradeCube: the size of their attributes
+        return sum(estimate_bytes(v, seen) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Size-bounded least-recently-used cache with hit/miss counters.
+
+    maxsize bounds the number of entries; max_bytes, if given, also bounds their
+    estimated memory (see estimate_bytes). A value larger than max_bytes on its
+    own is returned but not stored.
+    """
+
+    def __init__(self, maxsize=32, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = estimate_bytes(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._discard(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                self._discard(next(iter(self._data)))
+
+    def _discard(self, key):
+        if key in self._data:
+            del self._data[key]
+            self.nbytes -= self._sizes.pop(key)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize,
+                "mb": self.nbytes / 1024 ** 2,
+                "max_mb": self.max_bytes / 1024 ** 2 if self.max_bytes is not None else None}
+
+def dataset_fingerprint(df, resolved=None):
+    """Cheap content hash of a dataframe (values, index and headers) plus the resolved mapping."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    if resolved is not None:
+        h.update(repr(sorted(resolved.items())).encode())
+    return h.hexdigest()
+
+# Shared by every Streamlit session in this process, so it is bounded by memory as well as entries
+analysis_cache = LRUCache(maxsize=32, max_bytes=int(CACHE_MB * 1024 ** 2))
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+from src.data_processor import as_datetime, pnl_values
+from src.profiling import timed
+
+DIMENSIONS = ["market", "direction", "month", "weekday", "hour"]
+MEASURES = ["count", "wins", "gross_profit", "gross_loss", "sum_pnl", "sum_sq_pnl"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def _cells(df, resolved):
+    """Aggregate a frame of trades into cube cells with one vectorized groupby."""
+    n = len(df)
+    keys = {}
+    for dim in ["market", "direction"]:
+        col = resolved.get(dim)
+        keys[dim] = df[col].astype(str).to_numpy() if col in df.columns else np.full(n, "Unknown", dtype=object)
+
+    date_col = resolved.get("date")
+    dates = as_datetime(df[date_col]) if date_col in df.columns else pd.Series(pd.NaT, index=df.index)
+    keys["month"] = (dates.dt.year * 100 + dates.dt.month).fillna(-1).astype(int).to_numpy()
+    keys["weekday"] = dates.dt.dayofweek.fillna(-1).astype(int).to_numpy()
+    keys["hour"] = dates.dt.hour.fillna(-1).astype(int).to_numpy()
+
+    pnl = pnl_values(df, resolved).to_numpy(dtype=float)
+    frame = pd.DataFrame({
+        **keys,
+        "count": np.ones(n, dtype=np.int64),
+        "wins": (pnl > 0).astype(np.int64),
+        "gross_profit": np.where(pnl > 0, pnl, 0.0),
+        "gross_loss": np.where(pnl < 0, -pnl, 0.0),
+        "sum_pnl": pnl,
+        "sum_sq_pnl": pnl * pnl
+    })
+    return frame.groupby(DIMENSIONS, sort=False)[MEASURES].sum()
+
+def _label(dim, values):
+    """Readable labels for the integer-coded month/weekday dimensions."""
+    if dim == "month":
+        return [f"{v // 100:04d}-{v % 100:02d}" if v >= 0 else "Unknown" for v in values]
+    if dim == "weekday":
+        return [WEEKDAYS[v] if v >= 0 else "Unknown" for v in values]
+    return list(values)
+
+def _derive(agg):
+    """Add KPI columns derived from the additive measures."""
+    count = agg["count"]
+    wins = agg["wins"]
+    losses = count - wins
+    out = agg.copy()
+    out["losses"] = losses
+    out["win_rate"] = wins / count * 100
+    out["avg_win"] = (agg["gross_profit"] / wins).where(wins > 0, 0.0)
+    out["avg_loss"] = (agg["gross_loss"] / losses).where(losses > 0, 0.0)
+    out["expectancy"] = out["win_rate"] / 100 * out["avg_win"] - (100 - out["win_rate"]) / 100 * out["avg_loss"]
+    out["profit_factor"] = agg["gross_profit"] / agg["gross_loss"].replace(0, 1e-9)
+    mean = agg["sum_pnl"] / count
+    std = np.sqrt((agg["sum_sq_pnl"] / count - mean ** 2).clip(lower=0))
+    out["avg_pnl"] = mean
+    out["sharpe"] = mean / std.replace(0, 1e-9)
+    return out
+
+class TradeCube:
+    """Additive PnL aggregates over (market, direction, month, weekday, hour).
+
+    Built in one vectorized pass and updated incrementally (database.journal_cube
+    folds every insert into the stored journal's cube); any breakdown is a roll-up
+    over the cells rather than a rescan of the trades. Months are stored as
+    YYYYMM integers and weekdays as 0=Mon (labelled in roll-ups); both are -1, like
+    hour, for trades without a date.
+    """
+
+    def __init__(self, cells=None):
+        if cells is None:
+            index = pd.MultiIndex.from_arrays([[] for _ in DIMENSIONS], names=DIMENSIONS)
+            cells = pd.DataFrame(
+                {m: pd.Series(dtype="int64" if m in ("count", "wins") else float) for m in MEASURES}, index=index
+            )
+        self._cells = cells
+        self._pending = []
+        self._pending_rows = 0
+
+    @classmethod
+    @timed("TradeCube.from_trades")
+    def from_trades(cls, df, resolved):
+        if "pnl" not in resolved:
+            return None
+        return cls(_cells(df, resolved))
+
+    @property
+    def cells(self):
+        """Consolidated cell table (merges any pending updates first)."""
+        if self._pending:
+            self._cells = pd.concat([self._cells, *self._pending]).groupby(level=DIMENSIONS, sort=False).sum()
+            self._pending = []
+            self._pending_rows = 0
+        return self._cells
+
+    def update(self, new_trades, resolved):
+        """Fold newly inserted trades into the cube.
+
+        The new cells are queued and merged lazily, so an update costs O(k) until
+        the queue outgrows a quarter of the cube.
+        """
+        if "pnl" in resolved and len(new_trades):
+            block = _cells(new_trades, resolved)
+            self._pending.append(block)
+            self._pending_rows += len(block)
+            if self._pending_rows > max(10000, len(self._cells) // 4):
+                self.cells
+        return self
+
+    def rollup(self, dims=None):
+        """Aggregate the cells over the given dimensions (all trades when dims is None) with derived KPIs."""
+        frames = [self._cells, *self._pending]
+        if dims is None:
+            agg = pd.concat([f.sum().to_frame().T for f in frames]).sum().to_frame().T
+            agg.index = ["All"]
+            return _derive(agg)
+
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        agg = pd.concat([f.groupby(level=dims, sort=False).sum() for f in frames])
+        agg = agg.groupby(level=dims, sort=True).sum()
+        if len(dims) == 1:
+            agg.index = pd.Index(_label(dims[0], agg.index), name=dims[0])
+        else:
+            agg.index = pd.MultiIndex.from_arrays(
+                [_label(d, agg.index.get_level_values(d)) for d in dims], names=dims
+            )
+        return _derive(agg)
@@ -1,13 +1,32 @@
 import pandas as pd
-import chardet
+import numpy as np
+import codecs
 import io
+import os
+import time
+from functools import lru_cache
+from src.profiling import timed
+
+ENCODING_SAMPLE_BYTES = 64 * 1024
+CSV_CHUNK_ROWS = 50000
+NUMERIC_FIELDS = ["entry", "stop_loss", "take_profit", "exit_price", "pnl", "risk_reward", "quantity"]
+TEXT_FIELDS = ["market", "direction", "notes"]
+# Compact mode: low-cardinality labels become categoricals, these may be downcast
+CATEGORY_FIELDS = ["market", "direction"]
+DOWNCAST_FIELDS = ["entry", "stop_loss", "take_profit", "exit_price", "quantity"]
+
+def _normalized_names(columns):
+    """Normalize raw header names (lowercase, underscores, no dots)."""
+    return pd.Index(_normalized_signature(tuple(columns)))
+
+@lru_cache(maxsize=256)
+def _normalized_signature(columns):
+    names = pd.Index(columns).str.lower().str.strip()
+    return tuple(names.str.replace(" ", "_").str.replace(".", "", regex=False))
 
 def normalize_columns(df_in):
-    """Normalize column names for consistency."""
-    df2 = df_in.copy()
-    df2.columns = df2.columns.str.lower().str.strip()
-    df2.columns = df2.columns.str.replace(" ", "_").str.replace(".", "", regex=False)
-    return df2
+    """Normalize column names for consistency (a shallow rename; column data is shared, not copied)."""
+    return df_in.set_axis(_normalized_names(df_in.columns), axis=1, copy=False)
 
 def get_column_mapping():
     """Returns the standard column mapping."""
@@ -25,30 +44,114 @@ def get_column_mapping():
         "notes": ["notes", "note", "comment"]
     }
 
-def resolve_columns(df):
-    """Resolve dataframe columns to standard names."""
+def _resolve_names(columns):
+    """Resolve a list of normalized column names to standard names (memoized per header signature)."""
+    return dict(_resolve_signature(tuple(columns)))
+
+@lru_cache(maxsize=256)
+def _resolve_signature(columns):
     col_map = get_column_mapping()
+    present = set(columns)
     resolved = {}
     for std, candidates in col_map.items():
         for c in candidates:
-            if c in df.columns:
+            if c in present:
                 resolved[std] = c
                 break
-    return resolved
+    return tuple(resolved.items())
+
+def resolve_columns(df):
+    """Resolve dataframe columns to standard names."""
+    return _resolve_names(df.columns)
+
+def as_numeric(series):
+    """A column as numbers; already-numeric columns are returned as-is instead of re-parsed."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series
+    return pd.to_numeric(series, errors="coerce")
+
+def as_datetime(series):
+    """A column as datetimes; already-parsed columns are returned as-is."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
 
-def process_data(df):
-    """Process and clean the dataframe."""
+def pnl_values(df, resolved):
+    """The resolved PnL column as floats with missing values counted as 0."""
+    pnl = as_numeric(df[resolved["pnl"]])
+    return pnl.fillna(0) if pnl.hasnans else pnl
+
+def frame_memory_mb(df):
+    """Deep memory usage of a dataframe in MB."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def _downcast(series):
+    """int32/int64 or float32, whichever round-trips every value exactly, else the series unchanged.
+
+    Integers never go below int32: sums and products of int8/int16 columns would
+    silently wrap around.
+    """
+    values = series.to_numpy(dtype=float)
+    if not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+        ints = pd.to_numeric(series, downcast="integer")
+        return ints.astype(np.int32) if ints.dtype.itemsize < 4 else ints
+    small = values.astype(np.float32)
+    if np.array_equal(small.astype(float), values, equal_nan=True):
+        return pd.Series(small, index=series.index, name=series.name)
+    return series
+
+def compact_frame(df, resolved):
+    """Shrink a processed frame in place of its columns.
+
+    market/direction become categoricals, notes an Arrow-backed string column, and
+    price/quantity columns are downcast only where every value survives exactly.
+    PnL stays float64 so cumulative sums keep full precision.
+    """
+    for std in CATEGORY_FIELDS:
+        col = resolved.get(std)
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    notes = resolved.get("notes")
+    if notes in df.columns:
+        df[notes] = df[notes].astype("string[pyarrow]")
+    for std in DOWNCAST_FIELDS:
+        col = resolved.get(std)
+        if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+            df[col] = _downcast(df[col])
+    return df
+
+@timed()
+def process_data(df, compact=False):
+    """Process and clean the dataframe.
+
+    This is the one normalization stage: headers are renamed without copying the
+    data, the column mapping is resolved once per header signature and known
+    fields are parsed only when they are not already typed. Downstream code reads
+    the columns through as_numeric/as_datetime, which are no-ops on its output.
+
+    With compact=True the frame is also converted by compact_frame and no constant
+    quantity column is added (consumers default it to 1); memory before/after is
+    recorded in df.attrs["memory"].
+    """
+    if compact:
+        before = frame_memory_mb(df)
     df = normalize_columns(df)
     resolved = resolve_columns(df)
     
     # Ensure date numeric parsing where possible
     if "date" in resolved:
-        df[resolved["date"]] = pd.to_datetime(df[resolved["date"]], errors="coerce")
+        col = df[resolved["date"]]
+        typed = as_datetime(col)
+        if typed is not col:
+            df[resolved["date"]] = typed
 
     # Ensure numeric columns for known fields
-    for ncol in ["entry", "stop_loss", "take_profit", "exit_price", "pnl", "risk_reward", "quantity"]:
+    for ncol in NUMERIC_FIELDS:
         if ncol in resolved:
-            df[resolved[ncol]] = pd.to_numeric(df[resolved[ncol]], errors="coerce")
+            col = df[resolved[ncol]]
+            typed = as_numeric(col)
+            if typed is not col:
+                df[resolved[ncol]] = typed
 
     # Compute pnl if not present but exit/entry/quantity present
     if "pnl" not in resolved and {"entry", "exit_price", "quantity"}.issubset(resolved.keys()):
@@ -63,6 +166,11 @@ def process_data(df):
         except Exception:
             pass
 
+    if compact:
+        df = compact_frame(df, resolved)
+        df.attrs["memory"] = {"before_mb": float(before), "after_mb": float(frame_memory_mb(df))}
+        return df, resolved
+
     # fallback quantity
     if "quantity" not in resolved:
         df["_quantity_fallback"] = 1
@@ -70,14 +178,164 @@ def process_data(df):
         
     return df, resolved
 
+def detect_encoding(sample):
+    """Detect the encoding of a bounded byte sample, checking BOMs first."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    import chardet
+    enc = chardet.detect(sample)["encoding"]
+    # An all-ASCII sample says nothing about the rest of the file; UTF-8 is its superset
+    if not enc or enc.lower() == "ascii":
+        return "utf-8"
+    return enc
+
+def _sniff_encoding(f, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """Detect the encoding of a file object from its first bytes, then rewind it."""
+    f.seek(0)
+    enc = detect_encoding(f.read(sample_bytes))
+    f.seek(0)
+    return enc
+
+def csv_dtypes(columns):
+    """Explicit read_csv dtypes for the raw headers that resolve to known fields."""
+    raw_by_name = dict(zip(_normalized_names(columns), columns))
+    dtypes = {}
+    for std, name in _resolve_names(list(raw_by_name)).items():
+        if std in NUMERIC_FIELDS:
+            dtypes[raw_by_name[name]] = "float64"
+        elif std in TEXT_FIELDS:
+            dtypes[raw_by_name[name]] = "object"
+    return dtypes
+
+def _decodes(f, enc, block_bytes=16 * ENCODING_SAMPLE_BYTES):
+    """Whether the whole file decodes as enc, checked block by block; rewinds f."""
+    f.seek(0)
+    try:
+        decoder = codecs.getincrementaldecoder(enc)()
+        for block in iter(lambda: f.read(block_bytes), b""):
+            decoder.decode(block)
+        decoder.decode(b"", final=True)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+    finally:
+        f.seek(0)
+
+def _detect_whole_file(f, block_bytes=16 * ENCODING_SAMPLE_BYTES):
+    """Run chardet over the whole file, for when the sample was misleading; rewinds f."""
+    from chardet.universaldetector import UniversalDetector
+    detector = UniversalDetector()
+    f.seek(0)
+    for block in iter(lambda: f.read(block_bytes), b""):
+        detector.feed(block)
+        if detector.done:
+            break
+    detector.close()
+    f.seek(0)
+    return detector.result["encoding"]
+
+def _verified_encoding(f):
+    """Encoding that decodes the whole file, verified before any row is parsed.
+
+    Tries the sampled guess and UTF-8 first. A non-ASCII byte past the sample can
+    make that guess wrong, so whole-file detection comes next, and cp1252/latin-1
+    last; latin-1 maps every byte, so a decode error never reaches the caller.
+    """
+    enc = _sniff_encoding(f)
+    for candidate in (enc, "utf-8-sig"):
+        if _decodes(f, candidate):
+            return candidate
+    detected = _detect_whole_file(f)
+    for candidate in (detected, "cp1252"):
+        if candidate and _decodes(f, candidate):
+            return candidate
+    return "latin-1"
+
+def iter_csv_chunks(f, chunksize=CSV_CHUNK_ROWS, typed=True):
+    """Yield raw dataframe chunks from a CSV file object without reading it all into memory.
+
+    With typed=True known numeric fields are parsed straight to float64. If a numeric
+    column turns out to hold text (e.g. "$5"), the rest of the file is read untyped
+    and process_data coerces it, as it does for load_csv.
+    """
+    # Verified up front: a decode error halfway through would leave earlier chunks written
+    enc = _verified_encoding(f)
+    header = pd.read_csv(f, encoding=enc, nrows=0).columns
+    f.seek(0)
+    dtype = csv_dtypes(header) if typed else None
+    rows = 0
+    try:
+        for chunk in pd.read_csv(f, encoding=enc, chunksize=chunksize, dtype=dtype):
+            rows += len(chunk)
+            yield chunk
+        return
+    except ValueError:
+        if not dtype:
+            raise
+    # Re-read untyped and drop the rows that were already yielded
+    f.seek(0)
+    for chunk in pd.read_csv(f, encoding=enc, chunksize=chunksize):
+        if rows >= len(chunk):
+            rows -= len(chunk)
+            continue
+        yield chunk.iloc[rows:]
+        rows = 0
+
+@timed()
+def ingest_csv(source, chunksize=CSV_CHUNK_ROWS, writer=None, progress=None, typed=True):
+    """Stream a CSV into the trade store chunk by chunk, in constant memory.
+
+    Each chunk goes through process_data and then writer(df, resolved), which
+    defaults to the configured storage backend. progress is called as
+    progress(rows, bytes_read, total_bytes) after every chunk. "inserted" counts the
+    new trades when the writer reports it (the SQLite store skips known trades),
+    otherwise it is None.
+    """
+    if writer is None:
+        from functools import partial
+        from src.storage import save_trades
+        # One duplicate counter for the whole file, so chunk boundaries do not change fingerprints
+        writer = partial(save_trades, seen={})
+
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        f.seek(0, os.SEEK_END)
+        total_bytes = f.tell()
+        f.seek(0)
+
+        rows = 0
+        inserted = None
+        start = time.perf_counter()
+        for chunk in iter_csv_chunks(f, chunksize, typed):
+            processed, resolved = process_data(chunk)
+            result = writer(processed, resolved)
+            if isinstance(result, dict) and "inserted" in result:
+                inserted = (inserted or 0) + result["inserted"]
+            rows += len(chunk)
+            if progress:
+                progress(rows, min(f.tell(), total_bytes), total_bytes)
+        elapsed = time.perf_counter() - start
+    finally:
+        if f is not source:
+            f.close()
+
+    return {
+        "rows": rows,
+        "inserted": inserted,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed > 0 else float(rows)
+    }
+
+@timed()
 def load_csv(uploaded_file):
     """Load and detect encoding for a CSV file."""
-    raw = uploaded_file.read()
-    enc = chardet.detect(raw)["encoding"] or "utf-8"
-    uploaded_file.seek(0)
+    enc = _sniff_encoding(uploaded_file)
     try:
         df = pd.read_csv(uploaded_file, encoding=enc)
-    except Exception:
-        uploaded_file.seek(0)
-        df = pd.read_csv(uploaded_file, encoding="utf-8-sig")
+    except (UnicodeDecodeError, LookupError):
+        # The sample missed a non-ASCII byte further in; check the whole file instead
+        enc = _verified_encoding(uploaded_file)
+        df = pd.read_csv(uploaded_file, encoding=enc)
     return df
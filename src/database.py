@@ -1,7 +1,17 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Text
+from sqlalchemy import (create_engine, Column, Integer, BigInteger, Float, String, DateTime, Text, Index,
+                        select, func, case, event, extract, inspect, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from concurrent.futures import Future
+import numpy as np
 import pandas as pd
+import os
+import time
+import atexit
+import queue
+import threading
+from src.data_processor import as_numeric, as_datetime
 from datetime import datetime
 
 Base = declarative_base()
@@ -19,40 +29,580 @@ class Trade(Base):
     quantity = Column(Float)
     pnl = Column(Float)
     notes = Column(Text)
+    fingerprint = Column(BigInteger)
 
-# SQLite for portability
-DB_URL = "sqlite:///trades.db"
-engine = create_engine(DB_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    __table_args__ = (
+        Index("ix_trades_date", "date"),
+        Index("ix_trades_market_date", "market", "date"),
+        Index("ix_trades_direction_date", "direction", "date"),
+        Index("ix_trades_pnl", "pnl"),
+        Index("ux_trades_fingerprint", "fingerprint", unique=True),
+    )
+
+# SQLite for portability; TRADETRACK_DB_URL points the store elsewhere
+DB_URL = os.environ.get("TRADETRACK_DB_URL", "sqlite:///trades.db")
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# writer; synchronous=NORMAL is durable under WAL; cache_size < 0 is in KiB.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "temp_store": "MEMORY"
+}
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+# Seconds a connection waits on a locked database before raising
+BUSY_TIMEOUT = 30
+_engine = None
+_session_factory = None
+_schema_ready = False
+_engine_lock = threading.RLock()
+_writer = None
+_data_version = 0
+_journal_cube = None
+# Columns the journal cube aggregates, mapped onto themselves
+CUBE_COLUMNS = ["date", "market", "direction", "pnl"]
+
+# Defaults used when a resolved column is missing (same as the ORM path)
+TEXT_DEFAULTS = {"market": "Unknown", "direction": "Unknown", "notes": ""}
+NUMERIC_DEFAULTS = {
+    "entry": 0, "stop_loss": 0, "take_profit": 0,
+    "exit_price": 0, "quantity": 1, "pnl": 0
+}
+DB_COLUMNS = ["date", "market", "direction", "entry", "stop_loss", "take_profit",
+              "exit_price", "quantity", "pnl", "notes"]
+BULK_BATCH_SIZE = 10000
+# Fields that identify a trade for de-duplication on re-import
+FINGERPRINT_FIELDS = ["date", "market", "direction", "entry", "exit_price", "quantity"]
+# Fingerprints checked per existence query on import
+LOOKUP_CHUNK = 500
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return on_connect
+
+def configure_engine(url=None, pragmas=None, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                     busy_timeout=BUSY_TIMEOUT):
+    """(Re)create the shared engine.
+
+    File-backed SQLite gets a QueuePool of connections, each set up with pragmas
+    (SQLITE_PRAGMAS by default) and a busy timeout. Any previous engine is disposed
+    and the schema is checked again on next use.
+    """
+    global _engine, _session_factory, _schema_ready
+    url = url or DB_URL
+    kwargs = {}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": busy_timeout}
+        # In-memory databases live in a single connection and keep SQLAlchemy's default pool
+        if ":memory:" not in url and url.rstrip("/") != "sqlite:":
+            kwargs.update(poolclass=QueuePool, pool_size=pool_size, max_overflow=max_overflow)
+    else:
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+    engine = create_engine(url, **kwargs)
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _set_pragmas(SQLITE_PRAGMAS if pragmas is None else pragmas))
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = engine
+        _session_factory = None
+        _schema_ready = False
+    _changed()
+    return engine
+
+def get_engine():
+    """The shared engine, created on first use rather than at import time."""
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                configure_engine()
+    return _engine
+
+def _sessionmaker():
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory
+
+def get_session():
+    """A new ORM session bound to the shared engine."""
+    return _sessionmaker()()
+
+def __getattr__(name):
+    # Keep `from src.database import engine` working without an import-time engine
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return _sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def init_db():
+    global _schema_ready
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    # Journals created before fingerprints existed get the column and a one-off backfill
+    if "fingerprint" not in {c["name"] for c in inspect(engine).get_columns("trades")}:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE trades ADD COLUMN fingerprint BIGINT"))
+        backfill_fingerprints()
+    # create_all skips indexes on tables that already exist
+    for index in Trade.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    _schema_ready = True
+
+def _changed(added=None):
+    """Record a committed write; added lists the DB-shaped frames it inserted, if known."""
+    global _data_version, _journal_cube
+    with _engine_lock:
+        _data_version += 1
+        if _journal_cube is None:
+            return
+        if added is None or any(frame is None for frame in added):
+            _journal_cube = None
+            return
+        resolved = {c: c for c in CUBE_COLUMNS}
+        for frame in added:
+            _journal_cube.update(frame, resolved)
+
+def journal_cube(chunksize=100000):
+    """TradeCube over every stored trade, kept current by this process's inserts.
+
+    Built once from the trades table in chunks; after that each committed insert
+    folds its new rows in (TradeCube.update) instead of rescanning. Writes made by
+    other processes are not seen, as with data_version.
+    """
+    global _journal_cube
+    from src.cube import TradeCube
+
+    cube = _journal_cube
+    if cube is not None:
+        return cube
+    _ensure_schema()
+    version = _data_version
+    cube = TradeCube()
+    resolved = {c: c for c in CUBE_COLUMNS}
+    stmt = select(*[Trade.__table__.c[c] for c in CUBE_COLUMNS])
+    with get_engine().connect() as conn:
+        for chunk in pd.read_sql(stmt, conn, chunksize=chunksize):
+            cube.update(chunk, resolved)
+    with _engine_lock:
+        # A write committed meanwhile may or may not be in the scan, so only keep a clean build
+        if _data_version == version:
+            _journal_cube = cube
+    return cube
+
+def journal_breakdown(dims=None):
+    """Roll up the journal cube (see journal_cube) over dims; safe while the writer thread updates it."""
+    cube = journal_cube()
+    with _engine_lock:
+        return cube.rollup(dims)
+
+def data_version():
+    """Counter bumped after every write this process commits (and on reconfiguration).
+
+    Use it in cache keys for results derived from the stored trades; writes made by
+    other processes are not seen.
+    """
+    return _data_version
+
+def _ensure_schema():
+    """Run init_db once per process (and engine) instead of on every call."""
+    if not _schema_ready:
+        with _engine_lock:
+            if not _schema_ready:
+                init_db()
+
+def _naive_utc(dates):
+    """Datetimes as naive UTC; the trades table stores no timezone."""
+    dates = as_datetime(dates)
+    if getattr(dates.dt, "tz", None) is not None:
+        return dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    return dates
+
+def to_db_frame(df, resolved):
+    """Map resolved columns onto the DB schema in one vectorized pass."""
+    out = pd.DataFrame(index=df.index)
+    date_col = resolved.get("date")
+    if date_col in df.columns:
+        out["date"] = _naive_utc(df[date_col])
+    else:
+        out["date"] = pd.NaT
+
+    for col in DB_COLUMNS[1:]:
+        src = resolved.get(col)
+        if col in TEXT_DEFAULTS:
+            if src in df.columns:
+                out[col] = df[src].astype(str)
+            else:
+                out[col] = TEXT_DEFAULTS[col]
+        elif src in df.columns:
+            out[col] = as_numeric(df[src]).astype(float, copy=False)
+        else:
+            out[col] = float(NUMERIC_DEFAULTS[col])
+    return out[DB_COLUMNS]
+
+def trade_fingerprints(frame, seen=None):
+    """Stable 64-bit fingerprints for a DB-shaped frame, computed in one vectorized pass.
+
+    Each trade is hashed over FINGERPRINT_FIELDS together with how many identical
+    trades precede it, so genuinely repeated trades within one file are kept while
+    importing the same file again matches every row. When a file arrives in chunks,
+    pass the same seen dict for every chunk: it carries the occurrence counts from
+    chunk to chunk (and is updated in place), so the fingerprints do not depend on
+    the chunk size.
+    """
+    key = pd.DataFrame({
+        "date": _naive_utc(frame["date"]).astype("datetime64[ns]").to_numpy().view("int64"),
+        "market": frame["market"].astype(str).to_numpy(),
+        "direction": frame["direction"].astype(str).to_numpy(),
+        **{c: as_numeric(frame[c]).to_numpy(dtype=float) for c in FINGERPRINT_FIELDS[3:]}
+    })
+    row_hash = pd.util.hash_pandas_object(key, index=False).to_numpy()
+    codes, uniques = pd.factorize(row_hash)
+    ordinal = pd.Series(codes).groupby(codes, sort=False).cumcount().to_numpy()
+    if seen is not None:
+        uniques = uniques.tolist()
+        before = np.fromiter((seen.get(h, 0) for h in uniques), dtype=np.int64, count=len(uniques))
+        ordinal = ordinal + before[codes]
+        seen.update(zip(uniques, (before + np.bincount(codes, minlength=len(uniques))).tolist()))
+    combined = pd.DataFrame({"hash": row_hash, "ordinal": ordinal})
+    # Stored as a signed 64-bit integer
+    return pd.util.hash_pandas_object(combined, index=False).to_numpy().view("int64")
+
+def backfill_fingerprints(chunksize=BULK_BATCH_SIZE):
+    """Fingerprint every stored trade that has none yet (trades imported before de-duplication)."""
+    engine = get_engine()
+    cols = ", ".join(["id"] + FINGERPRINT_FIELDS)
+    with engine.connect() as conn:
+        # Ordinals count over the whole table, so it is read in one go
+        stored = pd.read_sql(text(f"SELECT {cols} FROM trades WHERE fingerprint IS NULL ORDER BY id"), conn)
+    if stored.empty:
+        return 0
+    stored["fingerprint"] = trade_fingerprints(stored)
+    mark = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+    sql = f"UPDATE trades SET fingerprint = {mark} WHERE id = {mark}"
+    for i in range(0, len(stored), chunksize):
+        chunk = stored.iloc[i:i + chunksize]
+        with engine.begin() as conn:
+            conn.exec_driver_sql(sql, list(zip(chunk["fingerprint"].tolist(), chunk["id"].tolist())))
+    return len(stored)
+
+def _insert_stmt():
+    table = Trade.__table__
+    dialect = get_engine().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return table.insert()
+    return insert(table).on_conflict_do_nothing(index_elements=["fingerprint"])
+
+def _stored_fingerprints(conn, fps, chunksize=LOOKUP_CHUNK):
+    """Boolean mask of the fingerprints in fps that are already in the trades table."""
+    fps = pd.Series(fps)
+    # Plain driver SQL: compiling a large expanding IN costs more than the index lookups
+    mark = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    existing = []
+    for i in range(0, len(fps), chunksize):
+        batch = tuple(fps.iloc[i:i + chunksize].tolist())
+        sql = f"SELECT fingerprint FROM trades WHERE fingerprint IN ({', '.join([mark] * len(batch))})"
+        existing += [r[0] for r in conn.exec_driver_sql(sql, batch)]
+    return fps.isin(existing).to_numpy()
+
+def _insert_new(conn, chunk, added=None):
+    """Insert the rows of chunk whose fingerprint is not stored yet; returns how many were inserted.
+
+    Known fingerprints are filtered out before the rows are converted, so a re-import
+    only pays for an index lookup per existing trade; ON CONFLICT DO NOTHING covers
+    rows written concurrently by another process. The inserted rows are appended to
+    added (None when a conflict makes them unknown).
+    """
+    known = _stored_fingerprints(conn, chunk["fingerprint"])
+    if known.any():
+        chunk = chunk[~known]
+    if chunk.empty:
+        return 0
+    records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+    inserted = conn.execute(_insert_stmt(), records).rowcount
+    if added is not None:
+        added.append(chunk if inserted == len(chunk) else None)
+    return inserted
+
+def _with_fingerprints(frame, seen=None):
+    if "fingerprint" in frame.columns:
+        return frame
+    return frame.assign(fingerprint=trade_fingerprints(frame, seen))
+
+def _bulk_insert(frame, batch_size, progress=None):
+    """Insert a DB-shaped frame in chunked batches, one commit per batch, skipping trades already stored."""
+    frame = _with_fingerprints(frame)
+    total = len(frame)
+    inserted = 0
+    start = time.perf_counter()
+    for i in range(0, total, batch_size):
+        chunk = frame.iloc[i:i + batch_size]
+        added = []
+        with get_engine().begin() as conn:
+            inserted += _insert_new(conn, chunk, added)
+        _changed(added)
+        if progress:
+            progress(min(i + batch_size, total), total)
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": total,
+        "inserted": inserted,
+        "skipped": total - inserted,
+        "seconds": elapsed,
+        "rows_per_sec": total / elapsed if elapsed > 0 else float(total)
+    }
+
+_STOP = object()
+
+class TradeWriter:
+    """One background thread that performs every bulk trade insert of this process.
+
+    SQLite allows a single writer at a time, so concurrent sessions queue their
+    frames here instead of contending for the database lock. Small frames that are
+    waiting together are committed in one transaction of up to group_rows rows.
+    """
+
+    def __init__(self, group_rows=BULK_BATCH_SIZE):
+        self.group_rows = group_rows
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="trade-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, batch_size=BULK_BATCH_SIZE, progress=None):
+        """Queue a DB-shaped frame; the Future resolves to rows/seconds/rows_per_sec."""
+        future = Future()
+        self._queue.put((frame, batch_size, progress, future))
+        return future
+
+    def pending(self):
+        """Number of writes waiting in the queue."""
+        return self._queue.qsize()
+
+    def close(self, wait=True):
+        """Stop the thread once everything queued so far has been written."""
+        self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        carry = None
+        while True:
+            job = carry if carry is not None else self._queue.get()
+            carry = None
+            if job is _STOP:
+                return
+            jobs = [job]
+            rows = len(job[0])
+            # Jobs with a progress callback are written on their own
+            while job[2] is None and rows < self.group_rows:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP or nxt[2] is not None or rows + len(nxt[0]) > self.group_rows:
+                    carry = nxt
+                    break
+                jobs.append(nxt)
+                rows += len(nxt[0])
+            self._write(jobs)
+
+    def _write(self, jobs):
+        jobs = [j for j in jobs if j[3].set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        try:
+            if len(jobs) == 1:
+                frame, batch_size, progress, future = jobs[0]
+                future.set_result(_bulk_insert(frame, batch_size, progress))
+                return
+            start = time.perf_counter()
+            added = []
+            with get_engine().begin() as conn:
+                counts = [_insert_new(conn, _with_fingerprints(j[0]), added) for j in jobs]
+            _changed(added)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            for job in jobs:
+                if not job[3].done():
+                    job[3].set_exception(e)
+            return
+        rows = sum(len(j[0]) for j in jobs)
+        for (frame, _, _, future), inserted in zip(jobs, counts):
+            # seconds/rows_per_sec describe the whole commit the frame was part of
+            future.set_result({
+                "rows": len(frame),
+                "inserted": inserted,
+                "skipped": len(frame) - inserted,
+                "seconds": elapsed,
+                "rows_per_sec": rows / elapsed if elapsed > 0 else float(rows)
+            })
+
+def get_writer():
+    """The process-wide TradeWriter, started on first use."""
+    global _writer
+    if _writer is None:
+        with _engine_lock:
+            if _writer is None:
+                _writer = TradeWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+def submit_trades(df, resolved, batch_size=BULK_BATCH_SIZE, progress=None, seen=None):
+    """Convert trades to the DB schema here and queue them on the single writer; returns a Future.
+
+    progress(done, total), if given, is called from the writer thread. seen carries
+    duplicate counts across the chunks of one file (see trade_fingerprints).
+    """
+    _ensure_schema()
+    frame = _with_fingerprints(to_db_frame(df, resolved), seen)
+    return get_writer().submit(frame, batch_size, progress)
+
+def save_trades_to_db(df, resolved, bulk=False, batch_size=BULK_BATCH_SIZE, progress=None, seen=None):
+    """Save a dataframe of trades to the SQLite database.
+
+    The frame is converted in one vectorized pass and written through Core inserts
+    by the single writer thread (see submit_trades), so concurrent saves never
+    contend for the SQLite lock. With bulk=True it is committed in batches of
+    batch_size, otherwise in one transaction. Returns rows/inserted/skipped/seconds/
+    rows_per_sec once it is committed. Trades whose fingerprint is already stored
+    are skipped, so importing the same file twice adds nothing. Pass one seen dict
+    for every chunk of a file that is saved piecewise (see trade_fingerprints).
+    """
+    if not bulk:
+        batch_size = max(len(df), 1)
+    return submit_trades(df, resolved, batch_size, progress, seen).result()
+
+def _filtered(stmt, start=None, end=None, markets=None, directions=None, pnl_sign=None):
+    """Apply the common trade filters to a select statement.
+
+    pnl_sign is "win" (pnl > 0) or "loss" (pnl <= 0, NULL counted as 0), matching calculate_metrics.
+    """
+    if start is not None:
+        stmt = stmt.where(Trade.date >= pd.Timestamp(start).to_pydatetime())
+    if end is not None:
+        stmt = stmt.where(Trade.date <= pd.Timestamp(end).to_pydatetime())
+    if markets is not None:
+        stmt = stmt.where(Trade.market.in_(list(markets)))
+    if directions is not None:
+        stmt = stmt.where(Trade.direction.in_(list(directions)))
+    if pnl_sign == "win":
+        stmt = stmt.where(Trade.pnl > 0)
+    elif pnl_sign == "loss":
+        stmt = stmt.where(func.coalesce(Trade.pnl, 0.0) <= 0)
+    elif pnl_sign is not None:
+        raise ValueError(f"pnl_sign must be 'win' or 'loss', got {pnl_sign!r}")
+    return stmt
+
+def query_trades(start=None, end=None, markets=None, directions=None, pnl_sign=None,
+                 columns=None, limit=None, offset=None, after_id=None):
+    """Load a filtered page of trades ordered by id.
+
+    Use limit/offset for simple paging or after_id (the last id of the previous
+    page) as a keyset cursor, which stays fast on deep pages.
+    """
+    _ensure_schema()
+    table = Trade.__table__
+    cols = [table.c[c] for c in (columns or ["id"] + DB_COLUMNS)]
+    stmt = _filtered(select(*cols), start, end, markets, directions, pnl_sign)
+    if after_id is not None:
+        stmt = stmt.where(Trade.id > after_id)
+    stmt = stmt.order_by(Trade.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset is not None:
+        stmt = stmt.offset(offset)
+    with get_engine().connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+def top_trades_from_db(n=5, largest=True, start=None, end=None, markets=None, directions=None):
+    """Best (or worst) n trades straight from SQLite with ORDER BY pnl LIMIT n."""
+    _ensure_schema()
+    table = Trade.__table__
+    stmt = _filtered(select(*[table.c[c] for c in ["id"] + DB_COLUMNS]), start, end, markets, directions)
+    stmt = stmt.where(Trade.pnl.is_not(None))
+    stmt = stmt.order_by(Trade.pnl.desc() if largest else Trade.pnl.asc()).limit(n)
+    with get_engine().connect() as conn:
+        return pd.read_sql(stmt, conn)
+
+def aggregate_trades(group_by=None, start=None, end=None, markets=None, directions=None, pnl_sign=None):
+    """Per-group PnL aggregates computed in SQL.
+
+    group_by is a list drawn from "market", "direction" and "month"; None gives a
+    single overall row.
+    """
+    _ensure_schema()
+    pnl = func.coalesce(Trade.pnl, 0.0)
+    keys = {
+        "market": Trade.market,
+        "direction": Trade.direction,
+        # extract() compiles on SQLite and PostgreSQL alike; formatted as "YYYY-MM" below
+        "month": extract("year", Trade.date) * 100 + extract("month", Trade.date)
+    }
+    group_cols = [keys[g].label(g) for g in (group_by or [])]
+    stmt = select(
+        *group_cols,
+        func.count().label("count"),
+        func.sum(case((pnl > 0, 1), else_=0)).label("wins"),
+        func.sum(pnl).label("sum_pnl"),
+        func.sum(pnl * pnl).label("sum_pnl_sq"),
+        func.sum(case((pnl > 0, pnl), else_=0.0)).label("gross_profit"),
+        func.sum(case((pnl < 0, -pnl), else_=0.0)).label("gross_loss"),
+        func.min(pnl).label("min_pnl"),
+        func.max(pnl).label("max_pnl")
+    )
+    stmt = _filtered(stmt, start, end, markets, directions, pnl_sign)
+    if group_cols:
+        stmt = stmt.group_by(*group_cols).order_by(*group_cols)
+    with get_engine().connect() as conn:
+        out = pd.read_sql(stmt, conn)
+    if "month" in out.columns:
+        month = pd.to_numeric(out["month"]).astype("Int64")
+        text_month = (month // 100).astype(str) + "-" + (month % 100).astype(str).str.zfill(2)
+        out["month"] = text_month.astype(object).where(month.notna(), None)
+    return out
+
+def summary_from_db(**filters):
+    """Headline KPIs from SQL aggregates, without loading any trade rows.
+
+    Order-dependent metrics (drawdown, streaks) need the full series and are not included.
+    """
+    row = aggregate_trades(**filters).iloc[0]
+    total = int(row["count"])
+    if total == 0:
+        return {"total_trades": 0}
+    wins = int(row["wins"])
+    losses = total - wins
+    win_rate = wins / total * 100
+    avg_win = row["gross_profit"] / wins if wins else 0.0
+    avg_loss = row["gross_loss"] / losses if losses else 0.0
+    mean = row["sum_pnl"] / total
+    std = max(row["sum_pnl_sq"] / total - mean * mean, 0.0) ** 0.5
+    return {
+        "total_trades": total,
+        "wins": wins,
+        "losses": losses,
+        "win_rate": win_rate,
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+        "expectancy": (win_rate/100 * avg_win) - ((100 - win_rate)/100 * avg_loss),
+        "profit_factor": row["gross_profit"] / (row["gross_loss"] or 1e-9),
+        "sharpe": mean / (std or 1e-9),
+        "total_pnl": row["sum_pnl"],
+        "best_trade": row["max_pnl"],
+        "worst_trade": row["min_pnl"]
+    }
 
-def save_trades_to_db(df, resolved):
-    """Save a dataframe of trades to the SQLite database."""
-    init_db()
-    session = SessionLocal()
-    
-    # Map resolved columns back to DB schema
-    for _, row in df.iterrows():
-        trade = Trade(
-            date=row.get(resolved.get('date')) if pd.notnull(row.get(resolved.get('date'))) else None,
-            market=str(row.get(resolved.get('market'), 'Unknown')),
-            direction=str(row.get(resolved.get('direction'), 'Unknown')),
-            entry=float(row.get(resolved.get('entry'), 0)),
-            stop_loss=float(row.get(resolved.get('stop_loss'), 0)),
-            take_profit=float(row.get(resolved.get('take_profit'), 0)),
-            exit_price=float(row.get(resolved.get('exit_price'), 0)),
-            quantity=float(row.get(resolved.get('quantity'), 1)),
-            pnl=float(row.get(resolved.get('pnl'), 0)),
-            notes=str(row.get(resolved.get('notes'), ''))
-        )
-        session.add(trade)
-    
-    session.commit()
-    session.close()
-
-def load_trades_from_db():
-    """Load all trades from the SQLite database as a dataframe."""
-    init_db()
-    return pd.read_sql("SELECT * FROM trades", engine)
+def load_trades_from_db(start=None, end=None, markets=None, directions=None, pnl_sign=None, columns=None):
+    """Load trades from the SQLite database as a dataframe, optionally filtered."""
+    return query_trades(start, end, markets, directions, pnl_sign, columns)
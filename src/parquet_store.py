@@ -0,0 +1,104 @@
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.database import DB_COLUMNS, to_db_frame
+
+# Columnar store, hive-partitioned by month and market
+PARQUET_ROOT = "trades_parquet"
+
+TRADE_SCHEMA = pa.schema([
+    ("date", pa.timestamp("us")),
+    ("market", pa.string()),
+    ("direction", pa.string()),
+    ("entry", pa.float64()),
+    ("stop_loss", pa.float64()),
+    ("take_profit", pa.float64()),
+    ("exit_price", pa.float64()),
+    ("quantity", pa.float64()),
+    ("pnl", pa.float64()),
+    ("notes", pa.string()),
+    ("month", pa.string())
+])
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string()), ("market", pa.string())]), flavor="hive")
+
+def _write_frame(frame, root):
+    """Append a DB-shaped frame as new Parquet files under root."""
+    if frame.empty:
+        return 0
+    frame = frame.assign(month=frame["date"].dt.strftime("%Y-%m"))
+    table = pa.Table.from_pandas(frame, schema=TRADE_SCHEMA, preserve_index=False, safe=False)
+    # pyarrow refuses more than 1024 partitions per write by default; long histories exceed that
+    partitions = frame.groupby(["month", "market"], dropna=False, observed=True).ngroups
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=max(1024, partitions)
+    )
+    return len(frame)
+
+def save_trades_to_parquet(df, resolved, root=PARQUET_ROOT):
+    """Append a dataframe of trades to the Parquet store (never rewrites existing files)."""
+    return _write_frame(to_db_frame(df, resolved), root)
+
+def _filter_expression(start=None, end=None, markets=None, directions=None, pnl_sign=None):
+    """Build a pushdown filter; date bounds also prune month partitions."""
+    expr = None
+
+    def add(e):
+        return e if expr is None else expr & e
+
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = add(ds.field("month") >= start.strftime("%Y-%m"))
+        expr = add(ds.field("date") >= pa.scalar(start.to_pydatetime(), type=pa.timestamp("us")))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expr = add(ds.field("month") <= end.strftime("%Y-%m"))
+        expr = add(ds.field("date") <= pa.scalar(end.to_pydatetime(), type=pa.timestamp("us")))
+    if markets is not None:
+        expr = add(ds.field("market").isin(list(markets)))
+    if directions is not None:
+        expr = add(ds.field("direction").isin(list(directions)))
+    if pnl_sign == "win":
+        expr = add(ds.field("pnl") > 0)
+    elif pnl_sign == "loss":
+        expr = add((ds.field("pnl") <= 0) | ds.field("pnl").is_null())
+    elif pnl_sign is not None:
+        raise ValueError(f"pnl_sign must be 'win' or 'loss', got {pnl_sign!r}")
+    return expr
+
+def load_trades_from_parquet(root=PARQUET_ROOT, start=None, end=None, markets=None,
+                             directions=None, pnl_sign=None, columns=None):
+    """Load trades from the Parquet store, pushing filters and column projection into the scan.
+
+    Rows are returned in date order.
+    """
+    columns = list(columns) if columns else list(DB_COLUMNS)
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING, schema=TRADE_SCHEMA)
+    scan_cols = columns if "date" in columns else columns + ["date"]
+    table = dataset.to_table(
+        columns=scan_cols,
+        filter=_filter_expression(start, end, markets, directions, pnl_sign)
+    )
+    df = table.to_pandas()
+    df = df.sort_values("date", kind="stable", na_position="last").reset_index(drop=True)
+    return df[columns]
+
+def migrate_sqlite_to_parquet(root=PARQUET_ROOT, chunksize=100000):
+    """One-shot copy of every row in the SQLite trades table into the Parquet store."""
+    from src.database import get_engine, init_db
+
+    init_db()
+    cols = ", ".join(DB_COLUMNS)
+    identity = {c: c for c in DB_COLUMNS}
+    rows = 0
+    for chunk in pd.read_sql(f"SELECT {cols} FROM trades ORDER BY id", get_engine(), chunksize=chunksize):
+        rows += _write_frame(to_db_frame(chunk, identity), root)
+    return rows
@@ -0,0 +1,201 @@
+import os
+import io
+import json
+import time
+import functools
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# TRADETRACK_PROFILE=1 turns instrumentation on at startup
+ENABLED = os.environ.get("TRADETRACK_PROFILE", "") not in ("", "0")
+MAX_RECORDS = 1000
+CAPTURES = ("cprofile", "pyinstrument")
+# Lines of cProfile output kept per captured stage
+PROFILE_LINES = 30
+
+def _count_rows(args, result):
+    """Rows handled by a stage: the first dataframe argument, else a dataframe result."""
+    for value in list(args[:2]) + [result[0] if isinstance(result, tuple) and result else result]:
+        if hasattr(value, "shape") and hasattr(value, "index"):
+            return len(value)
+    return None
+
+class Profiler:
+    """Per-stage timings for the analysis pipeline.
+
+    Each stage records wall time, CPU time (all threads), rows and, with memory=True,
+    the tracemalloc peak above the memory in use when the stage started. capture
+    ("cprofile" or "pyinstrument") also keeps a call profile of every outermost stage.
+
+    While disabled, timed functions only pay one attribute check per call.
+    """
+
+    def __init__(self, enabled=False, memory=True, capture=None, max_records=MAX_RECORDS):
+        self.enabled = False
+        self.memory = memory
+        self.capture = capture
+        self.records = deque(maxlen=max_records)
+        self.profiles = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+        if enabled:
+            self.enable(memory, capture)
+
+    def enable(self, memory=True, capture=None):
+        if capture is not None and capture not in CAPTURES:
+            raise ValueError(f"capture must be one of {CAPTURES}, got {capture!r}")
+        if capture == "pyinstrument":
+            import pyinstrument  # noqa: F401 - fail early when it is not installed
+        self.memory = memory
+        self.capture = capture
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self.profiles.clear()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, name, wall, cpu=None, rows=None, peak_mb=None, depth=0):
+        """Add a measurement taken elsewhere (e.g. in a worker process)."""
+        with self._lock:
+            self.records.append({
+                "stage": name, "wall": wall, "cpu": cpu, "rows": rows, "peak_mb": peak_mb,
+                "depth": depth, "thread": threading.current_thread().name, "at": time.time()
+            })
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the enclosed block as stage name; set info["rows"] inside it if rows is known later."""
+        info = {"rows": rows}
+        if not self.enabled:
+            yield info
+            return
+        stack = self._stack()
+        tracing = self.memory and tracemalloc.is_tracing()
+        base = 0
+        if tracing:
+            base, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # The parent's peak so far would be lost by reset_peak
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        frame = {"peak": base}
+        outer = not stack
+        stack.append(frame)
+        profiler = self._start_capture() if outer and self.capture else None
+        cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu
+            if profiler is not None:
+                self._stop_capture(name, profiler)
+            stack.pop()
+            peak_mb = None
+            if tracing and tracemalloc.is_tracing():
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                peak_mb = (peak - base) / 1024 ** 2
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            self.record(name, wall, cpu, info["rows"], peak_mb, depth=len(stack))
+
+    def _start_capture(self):
+        if self.capture == "pyinstrument":
+            from pyinstrument import Profiler as Sampler
+            profiler = Sampler()
+            profiler.start()
+            return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return None
+        return profiler
+
+    def _stop_capture(self, name, profiler):
+        if self.capture == "pyinstrument":
+            profiler.stop()
+            text = profiler.output_text()
+        else:
+            import pstats
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            text = out.getvalue()
+        with self._lock:
+            self.profiles[name] = text
+
+    def timed(self, name=None):
+        """Decorator that runs the function as a stage (named after it by default)."""
+        def decorate(fn):
+            stage_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.stage(stage_name) as info:
+                    result = fn(*args, **kwargs)
+                    info["rows"] = _count_rows(args, result)
+                return result
+            return wrapper
+        return decorate
+
+    def summary(self):
+        """Records aggregated per stage, slowest total wall time first."""
+        import pandas as pd
+
+        records = pd.DataFrame(list(self.records))
+        if records.empty:
+            return pd.DataFrame(columns=["calls", "wall", "mean_wall", "cpu", "rows", "peak_mb"])
+        grouped = records.groupby("stage", sort=False)
+        out = pd.DataFrame({
+            "calls": grouped.size(),
+            "wall": grouped["wall"].sum(),
+            "mean_wall": grouped["wall"].mean(),
+            "cpu": grouped["cpu"].sum(min_count=1),
+            "rows": grouped["rows"].max(),
+            "peak_mb": grouped["peak_mb"].max()
+        })
+        return out.sort_values("wall", ascending=False)
+
+    def to_json(self, path=None):
+        """All records, the per-stage summary and captured profiles as JSON (written to path if given)."""
+        summary = self.summary()
+        payload = {
+            "records": list(self.records),
+            "summary": json.loads(summary.to_json(orient="index")),
+            "profiles": dict(self.profiles)
+        }
+        text = json.dumps(payload, indent=2, default=str)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+# Shared by the whole process; the app's sidebar panel toggles it
+profiler = Profiler(enabled=ENABLED)
+timed = profiler.timed
+stage = profiler.stage
@@ -1,19 +1,107 @@
 from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
 import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from src.profiling import timed
 
-def generate_pdf_report(metrics, temp_images):
-    """Generate a PDF report with metrics and charts."""
-    buffer = BytesIO()
+# Report tables are capped so their size does not grow with the journal
+REPORT_TABLE_ROWS = 24
+MAX_FINISHED_JOBS = 16
+
+class ReportCancelled(Exception):
+    """Raised inside a report build when its job has been cancelled."""
+
+@timed()
+def report_sections(df, resolved, top_n=5, max_rows=REPORT_TABLE_ROWS):
+    """Summary tables for the report: per-market, per-direction, monthly, deepest drawdowns and top/bottom trades.
+
+    Aggregates come from a TradeCube roll-up, so every table has a bounded number
+    of rows however large the journal is.
+    """
+    from src.cube import TradeCube
+    from src.analytics import top_n_trades
+    from src.timeseries import time_metrics
+
+    cube = TradeCube.from_trades(df, resolved)
+    if cube is None:
+        return {}
+    cols = ["count", "win_rate", "sum_pnl", "expectancy", "profit_factor"]
+    sections = {}
+    if resolved.get("market") in df.columns:
+        sections["Performance by Market"] = cube.rollup("market")[cols].sort_values("sum_pnl", ascending=False).head(max_rows)
+    if resolved.get("direction") in df.columns:
+        sections["Performance by Direction"] = cube.rollup("direction")[cols]
+    if resolved.get("date") in df.columns:
+        monthly = cube.rollup("month")[cols]
+        sections["Monthly Breakdown"] = monthly[monthly.index != "Unknown"].tail(max_rows)
+        tm = time_metrics(df, resolved)
+        if tm is not None and not tm["drawdowns"].empty:
+            drawdowns = tm["drawdowns"].head(top_n)
+            sections["Deepest Drawdowns"] = drawdowns.assign(
+                duration=drawdowns["duration"].dt.days, recovery_time=drawdowns["recovery_time"].dt.days
+            ).drop(columns="recovered").rename(columns={"duration": "days", "recovery_time": "days_to_recover"})
+
+    show = [resolved[k] for k in ["date", "market", "direction", "entry", "exit_price"] if resolved.get(k) in df.columns]
+    for title, largest in [("Top Trades", True), ("Worst Trades", False)]:
+        top = top_n_trades(df, resolved, top_n, largest=largest)
+        sections[title] = top[show + ["_pnl"]].rename(columns={"_pnl": "pnl"}).reset_index(drop=True)
+    return sections
+
+def _table(frame):
+    """Render a small dataframe as a styled reportlab table."""
+    from reportlab.platypus import Table, TableStyle
+    from reportlab.lib import colors
+
+    def fmt(v):
+        # NaN and NaT (e.g. a drawdown that has not recovered)
+        if v is None or v != v:
+            return "-"
+        if isinstance(v, float):
+            return f"{v:,.2f}"
+        if hasattr(v, "strftime"):
+            return v.strftime("%Y-%m-%d")
+        return str(v)
+
+    index_name = frame.index.name or ""
+    named = bool(frame.index.name)
+    header = ([index_name] if named else []) + [str(c).replace("_", " ").title() for c in frame.columns]
+    rows = [([fmt(i)] if named else []) + [fmt(v) for v in row] for i, row in zip(frame.index, frame.itertuples(index=False))]
+    table = Table([header] + rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("FONTSIZE", (0, 0), (-1, -1), 7),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ALIGN", (1, 1), (-1, -1), "RIGHT")
+    ]))
+    return table
+
+@timed()
+def generate_pdf_report(metrics, images, simulation=None, sections=None, output=None,
+                        progress=None, cancel=None):
+    """Generate a PDF report with metrics and charts.
+
+    images may be PNG bytes, file-like buffers or file paths. simulation is an
+    optional simulate_paths() result summarized in a Monte Carlo risk section, and
+    sections maps table titles to small dataframes (see report_sections).
+
+    The PDF is written to output (a path or binary file object) or, by default, to a
+    BytesIO that is returned. progress(done, total) is called as each element is laid
+    out; once the cancel event is set the build stops with ReportCancelled.
+    """
+    # reportlab is only needed once a report is requested
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.pagesizes import A4
+
+    buffer = BytesIO() if output is None else output
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = getSampleStyleSheet()
     flowables = []
 
     flowables.append(Paragraph("TradeTrack - Performance Report", styles["Title"]))
     flowables.append(Spacer(1, 8))
-    
+
     # KPIs summary
     flowables.append(Paragraph(f"Total Trades: {metrics['total_trades']}", styles["Normal"]))
     flowables.append(Paragraph(f"Win Rate: {metrics['win_rate']:.2f}%", styles["Normal"]))
@@ -24,24 +112,150 @@ def generate_pdf_report(metrics, temp_images):
     flowables.append(Paragraph(f"Max Drawdown: {metrics['max_drawdown']:.2f}", styles["Normal"]))
     flowables.append(Spacer(1, 12))
 
+    if simulation:
+        flowables.append(Paragraph(
+            f"Monte Carlo Risk ({simulation['paths']:,} {simulation['method']} paths)", styles["Heading2"]
+        ))
+        eq = simulation["final_equity_pct"]
+        dd = simulation["max_drawdown_pct"]
+        keys = list(eq)
+        keys = [keys[0], keys[len(keys) // 2], keys[-1]]
+        label = " / ".join(keys)
+        flowables.append(Paragraph(
+            f"Final Equity ({label}): " + " / ".join(f"{eq[k]:.2f}" for k in keys), styles["Normal"]
+        ))
+        flowables.append(Paragraph(
+            f"Max Drawdown ({label}): " + " / ".join(f"{dd[k]:.2f}" for k in keys), styles["Normal"]
+        ))
+        flowables.append(Paragraph(f"Probability of Loss: {simulation['prob_loss'] * 100:.2f}%", styles["Normal"]))
+        if simulation["prob_ruin"] is not None:
+            flowables.append(Paragraph(
+                f"Probability of Ruin ({simulation['ruin_fraction'] * 100:.0f}% of {simulation['capital']:,.2f}): "
+                f"{simulation['prob_ruin'] * 100:.2f}%", styles["Normal"]
+            ))
+        flowables.append(Spacer(1, 12))
+
     # Add charts into the PDF
-    for img_path in temp_images:
+    for img in images:
         try:
-            if os.path.exists(img_path):
-                flowables.append(RLImage(img_path, width=450, height=250))
-                flowables.append(Spacer(1, 12))
+            if isinstance(img, bytes):
+                img = BytesIO(img)
+            elif isinstance(img, (str, os.PathLike)) and not os.path.exists(img):
+                continue
+            flowables.append(RLImage(img, width=450, height=250))
+            flowables.append(Spacer(1, 12))
         except Exception:
             pass
 
+    for title, frame in (sections or {}).items():
+        if frame is None or frame.empty:
+            continue
+        flowables.append(Paragraph(title, styles["Heading2"]))
+        flowables.append(_table(frame))
+        flowables.append(Spacer(1, 12))
+
+    total = len(flowables)
+    done = [0]
+
+    def after_flowable(flowable):
+        if cancel is not None and cancel.is_set():
+            raise ReportCancelled()
+        done[0] += 1
+        if progress:
+            progress(min(done[0], total), total)
+
+    doc.afterFlowable = after_flowable
     doc.build(flowables)
-    buffer.seek(0)
+    if output is None:
+        buffer.seek(0)
     return buffer
 
-def cleanup_temp_images(temp_images):
-    """Remove temporary image files."""
-    for p in temp_images:
-        try:
-            if os.path.exists(p):
-                os.remove(p)
-        except Exception:
-            pass
+@timed()
+def build_report(df, resolved, metrics, images, simulation=None, progress=None, cancel=None):
+    """Full report (KPIs, charts, risk and summary tables) as PDF bytes."""
+    sections = report_sections(df, resolved)
+    if cancel is not None and cancel.is_set():
+        raise ReportCancelled()
+    return generate_pdf_report(metrics, images, simulation, sections, progress=progress, cancel=cancel).getvalue()
+
+class ReportJobs:
+    """Background report builds (and simulations) on a small thread pool, tracked by job id.
+
+    submit(fn, *args, **kwargs) runs fn(*args, progress=..., cancel=..., **kwargs)
+    off the caller's thread; poll status(job_id) and collect result(job_id) once the
+    state is "done". fn raising ReportCancelled or CancelledError marks the job
+    cancelled. Only the most recent finished jobs are kept.
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        job_id = uuid.uuid4().hex
+        job = {"state": "queued", "progress": 0.0, "error": None, "result": None,
+               "cancel": threading.Event(), "future": None}
+
+        def set_progress(done, total):
+            job["progress"] = done / total if total else 1.0
+
+        def run():
+            if job["cancel"].is_set():
+                job["state"] = "cancelled"
+                return
+            job["state"] = "running"
+            try:
+                job["result"] = fn(*args, progress=set_progress, cancel=job["cancel"], **kwargs)
+                job["progress"] = 1.0
+                job["state"] = "done"
+            except (ReportCancelled, CancelledError):
+                job["state"] = "cancelled"
+            except Exception as e:
+                job["error"] = str(e)
+                job["state"] = "failed"
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        job["future"] = self._pool.submit(run)
+        return job_id
+
+    def _prune(self):
+        finished = [k for k, j in self._jobs.items() if j["state"] in ("done", "failed", "cancelled")]
+        for k in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[k]
+
+    def status(self, job_id):
+        """State ("queued", "running", "done", "failed", "cancelled" or "unknown"), progress and error."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {"state": "unknown", "progress": 0.0, "error": None}
+        return {"state": job["state"], "progress": job["progress"], "error": job["error"]}
+
+    def result(self, job_id):
+        """The job's return value once done, otherwise None."""
+        job = self._jobs.get(job_id)
+        return job["result"] if job and job["state"] == "done" else None
+
+    def cancel(self, job_id):
+        """Request cancellation; a running build stops at its next layout step."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job["cancel"].set()
+        if job["future"] is not None and job["future"].cancel():
+            job["state"] = "cancelled"
+        return True
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes and return its status."""
+        job = self._jobs.get(job_id)
+        if job is not None and job["future"] is not None:
+            try:
+                job["future"].result(timeout)
+            except Exception:
+                pass
+        return self.status(job_id)
+
+report_jobs = ReportJobs()
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+from src.data_processor import as_numeric
+from src.profiling import timed
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+
+DEFAULT_PATHS = 10000
+PERCENTILES = [5, 25, 50, 75, 95]
+# Equity/drawdown bands are kept at this many points along the trade axis
+BAND_POINTS = 100
+# Memory budget for the (paths x trades) matrices of one block
+BLOCK_BYTES = 64 * 1024 ** 2
+METHODS = ("bootstrap", "shuffle")
+# Interactive runs keep paths x trades under this budget (~2-3s on one core)
+MAX_PATH_TRADES = 100_000_000
+MIN_PATHS = 200
+
+def _block_size(n_trades, block_bytes=BLOCK_BYTES):
+    """Paths per block so the equity and drawdown matrices fit in block_bytes."""
+    return max(1, int(block_bytes // (max(n_trades, 1) * 8 * 4)))
+
+def scaled_paths(n_paths, n_trades, budget=MAX_PATH_TRADES, min_paths=MIN_PATHS):
+    """n_paths, reduced for long journals so paths x trades stays within budget (never below min_paths)."""
+    return min(n_paths, max(min_paths, budget // max(n_trades, 1)))
+
+def _simulate_block(pnl, n_paths, seed, method, checkpoints, ruin_level):
+    """Simulate n_paths trade sequences and reduce them to per-path statistics.
+
+    Returns final equity, max drawdown, ruin flags and the equity/drawdown values at
+    the checkpoint trade indices (float32, paths x checkpoints).
+    """
+    rng = np.random.default_rng(seed)
+    if method == "bootstrap":
+        paths = pnl[rng.integers(0, len(pnl), size=(n_paths, len(pnl)))]
+    else:
+        paths = rng.permuted(np.broadcast_to(pnl, (n_paths, len(pnl))), axis=1)
+
+    equity = np.cumsum(paths, axis=1, out=paths)
+    drawdown = equity - np.maximum.accumulate(equity, axis=1)
+    ruined = None
+    if ruin_level is not None:
+        ruined = equity.min(axis=1) <= ruin_level
+    return {
+        "final_equity": equity[:, -1].copy(),
+        "max_drawdown": drawdown.min(axis=1),
+        "ruined": ruined,
+        "equity": equity[:, checkpoints].astype(np.float32),
+        "drawdown": drawdown[:, checkpoints].astype(np.float32)
+    }
+
+@timed()
+def simulate_paths(pnl_series, n_paths=DEFAULT_PATHS, method="bootstrap", seed=42,
+                   capital=None, ruin_fraction=0.5, workers=None, block_bytes=BLOCK_BYTES,
+                   percentiles=PERCENTILES, band_points=BAND_POINTS, progress=None, cancel=None):
+    """Monte Carlo distributions of final equity, max drawdown and ruin from a PnL series.
+
+    method "bootstrap" resamples trades with replacement, "shuffle" permutes their
+    order (final equity is then fixed, drawdown is not). Paths are simulated as 2-D
+    matrices in blocks bounded by block_bytes; each block draws from its own child of
+    SeedSequence(seed), so results are identical for any number of workers. With
+    workers > 1 blocks run on a process pool.
+
+    Ruin is losing ruin_fraction of the starting capital at any point of a path; it
+    is only evaluated when capital is given.
+
+    progress(done, total) is called after every block; setting the cancel event
+    stops before the next block with CancelledError.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    pnl = np.asarray(as_numeric(pd.Series(pnl_series)), dtype=float)
+    pnl = np.where(np.isnan(pnl), 0.0, pnl)
+    n = len(pnl)
+    if n == 0:
+        return None
+
+    checkpoints = np.unique(np.linspace(0, n - 1, min(band_points, n)).astype(int))
+    ruin_level = -capital * ruin_fraction if capital is not None else None
+    size = _block_size(n, block_bytes)
+    counts = [min(size, n_paths - i) for i in range(0, n_paths, size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    args = [(pnl, k, s, method, checkpoints, ruin_level) for k, s in zip(counts, seeds)]
+
+    blocks = []
+
+    def collect(block):
+        blocks.append(block)
+        if progress:
+            progress(len(blocks), len(args))
+
+    if workers and workers > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(_simulate_block, *a) for a in args]
+            for future in futures:
+                if cancel is not None and cancel.is_set():
+                    for f in futures:
+                        f.cancel()
+                    raise CancelledError()
+                collect(future.result())
+    else:
+        for a in args:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            collect(_simulate_block(*a))
+
+    def stack(key):
+        return np.concatenate([b[key] for b in blocks])
+
+    final_equity = stack("final_equity")
+    max_drawdown = stack("max_drawdown")
+    columns = [f"p{p}" for p in percentiles]
+    bands = {}
+    for key in ["equity", "drawdown"]:
+        values = np.percentile(stack(key), percentiles, axis=0).T
+        bands[key] = pd.DataFrame(values, index=pd.Index(checkpoints + 1, name="trade"), columns=columns)
+
+    return {
+        "paths": n_paths,
+        "method": method,
+        "seed": seed,
+        "equity_bands": bands["equity"],
+        "drawdown_bands": bands["drawdown"],
+        "final_equity": final_equity,
+        "max_drawdown": max_drawdown,
+        "final_equity_pct": dict(zip(columns, np.percentile(final_equity, percentiles).tolist())),
+        "max_drawdown_pct": dict(zip(columns, np.percentile(max_drawdown, percentiles).tolist())),
+        "prob_loss": float((final_equity < 0).mean()),
+        "prob_ruin": float(stack("ruined").mean()) if ruin_level is not None else None,
+        "capital": capital,
+        "ruin_fraction": ruin_fraction
+    }
@@ -0,0 +1,31 @@
+import os
+from src.profiling import timed
+
+# "sqlite" (default) or "parquet"
+BACKEND = os.environ.get("TRADETRACK_BACKEND", "sqlite")
+
+@timed()
+def save_trades(df, resolved, backend=None, seen=None):
+    """Save trades through the configured storage backend.
+
+    seen carries duplicate counts across the chunks of one file for the SQLite
+    store's de-duplication (see database.trade_fingerprints).
+    """
+    backend = backend or BACKEND
+    if backend == "parquet":
+        from src.parquet_store import save_trades_to_parquet
+        return save_trades_to_parquet(df, resolved)
+    from src.database import save_trades_to_db
+    return save_trades_to_db(df, resolved, bulk=True, seen=seen)
+
+@timed()
+def load_trades(backend=None, start=None, end=None, markets=None, directions=None,
+                pnl_sign=None, columns=None):
+    """Load trades from the configured storage backend, optionally filtered."""
+    backend = backend or BACKEND
+    if backend == "parquet":
+        from src.parquet_store import load_trades_from_parquet
+        return load_trades_from_parquet(start=start, end=end, markets=markets, directions=directions,
+                                        pnl_sign=pnl_sign, columns=columns)
+    from src.database import load_trades_from_db
+    return load_trades_from_db(start, end, markets, directions, pnl_sign, columns)
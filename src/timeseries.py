@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from src.cache import LRUCache, dataset_fingerprint
+from src.data_processor import as_datetime, pnl_values
+from src.profiling import timed
+
+# Calendar frequencies and the periods per year used to annualize them
+FREQUENCIES = {"D": 365, "B": 252, "W": 52}
+FREQ_LABELS = {"D": "Daily", "B": "Business days", "W": "Weekly"}
+DEFAULT_FREQ = "D"
+
+# Resampled series keyed by (date/PnL fingerprint, freq), shared across callers
+period_cache = LRUCache(maxsize=16)
+
+def _resample(df, resolved, freq):
+    dates = as_datetime(df[resolved["date"]])
+    known = dates.notna().to_numpy()
+    pnl = pd.Series(pnl_values(df, resolved).to_numpy()[known], index=dates.to_numpy()[known])
+    # resample sorts the timestamps and sums duplicates, so input order does not matter
+    periods = pnl.resample(freq).agg(["sum", "count"])
+    periods.columns = ["pnl", "trades"]
+    periods.index.name = "period"
+    return periods, int((~known).sum())
+
+def period_pnl(df, resolved, freq=DEFAULT_FREQ):
+    """PnL and trade count per calendar period (every period between the first and last trade).
+
+    Returns (frame, undated) where undated counts trades without a usable date. The
+    result is cached per date/PnL content and frequency.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of {list(FREQUENCIES)}, got {freq!r}")
+    if resolved.get("date") not in df.columns or "pnl" not in resolved:
+        return None, len(df)
+    key = (dataset_fingerprint(df[[resolved["date"], resolved["pnl"]]]), freq)
+    return period_cache.get_or_compute(key, lambda: _resample(df, resolved, freq))
+
+def drawdown_periods(equity):
+    """Every drawdown of a period equity curve: start (last peak), trough, recovery, depth and durations.
+
+    Equity starts from 0 before the first period, so an opening loss is a drawdown
+    too. Recovery is the first period back at the previous peak; drawdowns still
+    open at the end have no recovery and last until the final period.
+    """
+    columns = ["start", "trough", "recovery", "depth", "duration", "recovery_time", "recovered"]
+    values = equity.to_numpy(dtype=float)
+    peak = np.maximum.accumulate(np.maximum(values, 0.0))
+    under = values - peak
+    at_peak = under >= 0
+    if at_peak.all():
+        return pd.DataFrame(columns=columns)
+
+    index = equity.index
+    spell = np.cumsum(at_peak)
+    rows = np.flatnonzero(~at_peak)
+    ids = spell[rows]
+    peak_rows = np.flatnonzero(at_peak)
+    spells, first = np.unique(ids, return_index=True)
+
+    # Deepest point of each spell
+    order = np.lexsort((under[rows], ids))
+    trough_rows = rows[order][np.searchsorted(ids[order], spells)]
+
+    # Spell k starts at the k-th peak row (an opening loss at its first row) and ends at the next peak
+    has_peak = spells > 0
+    start_rows = rows[first].copy()
+    start_rows[has_peak] = peak_rows[spells[has_peak] - 1]
+    recovered = spells < len(peak_rows)
+    recovery = pd.Series(pd.NaT, index=range(len(spells)), dtype=index.dtype)
+    recovery[recovered] = index[peak_rows[spells[recovered]]]
+
+    start = index[start_rows]
+    trough = index[trough_rows]
+    recovery = pd.DatetimeIndex(recovery)
+    end = recovery.where(recovered, index[-1])
+    out = pd.DataFrame({
+        "start": start,
+        "trough": trough,
+        "recovery": recovery,
+        "depth": under[trough_rows],
+        "duration": end - start,
+        "recovery_time": recovery - trough,
+        "recovered": recovered
+    })
+    return out.sort_values("depth", kind="stable").reset_index(drop=True)
+
+@timed()
+def time_metrics(df, resolved, freq=DEFAULT_FREQ):
+    """Calendar-based risk metrics from PnL resampled to freq ("D", "B" or "W").
+
+    Sharpe and Sortino are annualized with the periods per year of freq, Calmar is
+    annualized PnL over the worst drawdown, and drawdown durations are measured in
+    calendar time. "series" holds pnl, trades, equity, peak and the underwater curve
+    per period; "drawdowns" lists every drawdown, deepest first. Returns None without
+    dated PnL.
+    """
+    periods, undated = period_pnl(df, resolved, freq)
+    if periods is None or periods.empty:
+        return None
+
+    per_year = FREQUENCIES[freq]
+    pnl = periods["pnl"]
+    equity = pnl.cumsum()
+    peak = equity.cummax().clip(lower=0.0)
+    series = periods.assign(equity=equity, peak=peak, underwater=equity - peak)
+
+    values = pnl.to_numpy(dtype=float)
+    mean = values.mean()
+    std = values.std()
+    downside = np.sqrt(np.mean(np.minimum(values, 0.0) ** 2))
+    max_drawdown = float(series["underwater"].min())
+    annual_pnl = mean * per_year
+
+    drawdowns = drawdown_periods(equity)
+    open_spells = drawdowns[~drawdowns["recovered"].astype(bool)] if not drawdowns.empty else drawdowns
+    deepest = drawdowns.iloc[0] if not drawdowns.empty else None
+
+    return {
+        "freq": freq,
+        "periods": len(series),
+        "periods_per_year": per_year,
+        "undated_trades": undated,
+        "annual_pnl": annual_pnl,
+        "sharpe_annual": mean / std * np.sqrt(per_year) if std > 0 else np.nan,
+        "sortino_annual": mean / downside * np.sqrt(per_year) if downside > 0 else np.nan,
+        "calmar": annual_pnl / abs(max_drawdown) if max_drawdown < 0 else np.nan,
+        "max_drawdown": max_drawdown,
+        "max_drawdown_duration": drawdowns["duration"].max() if not drawdowns.empty else pd.Timedelta(0),
+        "time_to_recovery": deepest["recovery_time"] if deepest is not None else pd.Timedelta(0),
+        "current_drawdown_duration": open_spells["duration"].iloc[0] if not open_spells.empty else pd.Timedelta(0),
+        "series": series,
+        "drawdowns": drawdowns
+    }
@@ -1,22 +1,83 @@
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
-import tempfile
-import os
-
-def save_fig_temp(fig, suffix=".png"):
-    """Save a matplotlib figure to a temporary file."""
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    fig.savefig(tmp.name, bbox_inches="tight")
-    tmp.close()
-    return tmp.name
-
-def plot_equity_curve(metrics):
-    """Plot cumulative PnL."""
+import time
+from io import BytesIO
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.analytics import rolling_metrics, ROLLING_WINDOW
+from src.data_processor import as_numeric, as_datetime
+from src.profiling import timed, profiler
+
+# Report/dashboard chart order
+CHART_NAMES = ["equity", "win_loss", "pnl_dist", "market", "rr", "monthly", "rolling"]
+
+# Above these sizes line series are downsampled and scatters become density plots
+MAX_LINE_POINTS = 2000
+MAX_SCATTER_POINTS = 10000
+
+_pool = None
+
+# matplotlib and plotly are imported inside the plot functions, so importing this
+# module (and starting the app) does not pay for them until a chart is drawn.
+
+@timed()
+def fig_to_png(fig):
+    """Render a matplotlib figure to PNG bytes in memory and close it."""
+    import matplotlib.pyplot as plt
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+def lttb(y, n_out, x=None):
+    """Largest-triangle-three-buckets downsampling; returns the indices of the kept points."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last points are kept as-is
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(int) + 1
+    edges[-1] = n - 1
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0] = a = 0
+    keep[-1] = n - 1
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt_start, nxt_end = end, edges[i + 2]
+        else:
+            nxt_start, nxt_end = n - 1, n
+        count = nxt_end - nxt_start
+        avg_x = (cx[nxt_end] - cx[nxt_start]) / count
+        avg_y = (cy[nxt_end] - cy[nxt_start]) / count
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def downsample_equity(equity, max_points=MAX_LINE_POINTS):
+    """Indices to plot for an equity curve: LTTB plus the max-drawdown peak/trough and global extremes."""
+    equity = np.asarray(equity, dtype=float)
+    if len(equity) <= max_points:
+        return np.arange(len(equity))
+    trough = int(np.argmin(equity - np.maximum.accumulate(equity)))
+    peak = int(np.argmax(equity[:trough + 1]))
+    extremes = [peak, trough, int(np.argmin(equity)), int(np.argmax(equity))]
+    return np.union1d(lttb(equity, max_points - len(extremes)), extremes)
+
+def plot_equity_curve(metrics, max_points=MAX_LINE_POINTS):
+    """Plot cumulative PnL, downsampled for very long histories."""
+    import matplotlib.pyplot as plt
+    equity = metrics["equity"].to_numpy()
+    keep = downsample_equity(equity, max_points)
     fig, ax = plt.subplots(figsize=(8, 3.5))
-    ax.plot(metrics["equity"].values, linewidth=2, color="tab:blue")
+    ax.plot(keep, equity[keep], linewidth=2, color="tab:blue")
     ax.set_title("Equity Curve (Cumulative PnL)")
     ax.set_xlabel("Trade #")
     ax.set_ylabel("Cumulative PnL")
@@ -25,16 +86,17 @@ def plot_equity_curve(metrics):
 
 def plot_win_loss_dist(df, pnl_series):
     """Plot win vs loss counts."""
-    df_temp = df.copy()
-    df_temp["_outcome"] = np.where(pnl_series > 0, "Win", "Loss")
+    import matplotlib.pyplot as plt
+    wins = int((np.asarray(pnl_series) > 0).sum())
     fig, ax = plt.subplots(figsize=(6, 3))
-    df_temp["_outcome"].value_counts().reindex(["Win", "Loss"], fill_value=0).plot(kind="bar", ax=ax, color=["green", "red"])
+    pd.Series({"Win": wins, "Loss": len(pnl_series) - wins}).plot(kind="bar", ax=ax, color=["green", "red"])
     ax.set_title("Win vs Loss Counts")
     ax.set_ylabel("Number of Trades")
     return fig
 
 def plot_pnl_dist(pnl_series):
     """Plot PnL distribution histogram."""
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(6, 3))
     ax.hist(pnl_series, bins=30, color="purple", alpha=0.7)
     ax.set_title("PnL Distribution (per trade)")
@@ -44,6 +106,7 @@ def plot_pnl_dist(pnl_series):
 
 def plot_market_breakdown(df, resolved):
     """Plot trades by market."""
+    import matplotlib.pyplot as plt
     market_col = resolved.get("market")
     if market_col and market_col in df.columns:
         fig, ax = plt.subplots(figsize=(7, 3))
@@ -54,12 +117,20 @@ def plot_market_breakdown(df, resolved):
         return fig
     return None
 
-def plot_rr_vs_pnl(df, resolved, pnl_series):
-    """Plot Risk-Reward vs PnL."""
+def plot_rr_vs_pnl(df, resolved, pnl_series, max_points=MAX_SCATTER_POINTS):
+    """Plot Risk-Reward vs PnL; large journals get a hexbin density plot instead of a scatter."""
+    import matplotlib.pyplot as plt
     rr_col = resolved.get("risk_reward")
     if rr_col and rr_col in df.columns:
         fig, ax = plt.subplots(figsize=(6, 4))
-        ax.scatter(df[rr_col], pnl_series, alpha=0.7, c=np.where(pnl_series > 0, "green", "red"))
+        if len(pnl_series) > max_points:
+            rr = as_numeric(df[rr_col]).to_numpy(dtype=float)
+            pnl = np.asarray(pnl_series, dtype=float)
+            finite = np.isfinite(rr) & np.isfinite(pnl)
+            hb = ax.hexbin(rr[finite], pnl[finite], gridsize=60, bins="log", cmap="viridis", mincnt=1)
+            fig.colorbar(hb, ax=ax, label="Trades (log)")
+        else:
+            ax.scatter(df[rr_col], pnl_series, alpha=0.7, c=np.where(pnl_series > 0, "green", "red"))
         ax.set_xlabel("Risk:Reward")
         ax.set_ylabel("PnL")
         ax.set_title("Risk:Reward vs PnL")
@@ -68,20 +139,186 @@ def plot_rr_vs_pnl(df, resolved, pnl_series):
 
 def plot_monthly_pnl(df, resolved, pnl_col):
     """Plot Monthly PnL using Plotly and a Matplotlib fallback."""
+    import matplotlib.pyplot as plt
+    import plotly.express as px
     if "date" in resolved and resolved["date"] in df.columns:
-        df["_date_parsed"] = pd.to_datetime(df[resolved["date"]], errors="coerce")
-        if df["_date_parsed"].notna().sum() > 0:
-            monthly = df.groupby(pd.Grouper(key="_date_parsed", freq="M")).agg(monthly_pnl=(pnl_col, lambda x: pd.to_numeric(x).sum()))
+        dates = as_datetime(df[resolved["date"]])
+        if dates.notna().sum() > 0:
+            months = dates.dt.to_period("M")
+            pnl = as_numeric(df[pnl_col])
+            monthly = pnl.groupby(months).sum()
+            # Keep empty months in the range so the bars read as a timeline
+            monthly = monthly.reindex(pd.period_range(months.min(), months.max(), freq="M"), fill_value=0)
+            monthly = pd.DataFrame({"month": monthly.index.astype(str), "monthly_pnl": monthly.to_numpy()})
             
             # Plotly Chart
-            fig_plotly = px.bar(monthly.reset_index(), x=monthly.reset_index().columns[0], y="monthly_pnl", title="Monthly PnL")
+            fig_plotly = px.bar(monthly, x="month", y="monthly_pnl", title="Monthly PnL")
             
             # Matplotlib Fallback for PDF
             fig_mpl, ax = plt.subplots(figsize=(8, 3))
-            ax.bar(monthly.reset_index().iloc[:,0].astype(str), monthly["monthly_pnl"])
+            ax.bar(monthly["month"], monthly["monthly_pnl"])
             ax.set_title("Monthly PnL")
             ax.set_ylabel("PnL")
-            ax.set_xticklabels(monthly.reset_index().iloc[:,0].astype(str), rotation=45, ha="right")
+            # Label at most ~24 months so long histories stay readable (and fast to lay out)
+            ticks = np.arange(0, len(monthly), max(1, len(monthly) // 24))
+            ax.set_xticks(ticks)
+            ax.set_xticklabels(monthly["month"].to_numpy()[ticks], rotation=45, ha="right")
             
             return fig_plotly, fig_mpl
     return None, None
+
+def plot_rolling_metrics(rolling, window=None, max_points=MAX_LINE_POINTS):
+    """Plot rolling win rate, expectancy, profit factor and Sharpe from rolling_metrics()."""
+    import matplotlib.pyplot as plt
+    if rolling is None or rolling["win_rate"].notna().sum() == 0:
+        return None
+    rolling = rolling.dropna(subset=["win_rate"])
+    x = np.arange(len(rolling)) if not isinstance(rolling.index, pd.DatetimeIndex) else rolling.index
+    fig, axes = plt.subplots(2, 2, figsize=(10, 5), sharex=True)
+    panels = [("win_rate", "Win Rate %"), ("expectancy", "Expectancy"),
+              ("profit_factor", "Profit Factor"), ("sharpe", "Sharpe")]
+    for ax, (col, label) in zip(axes.flat, panels):
+        values = rolling[col].to_numpy(dtype=float)
+        keep = lttb(values, max_points)
+        ax.plot(np.asarray(x)[keep], values[keep], linewidth=1.2)
+        ax.set_title(label)
+        ax.grid(True, linestyle="--", alpha=0.4)
+    axes[0, 1].axhline(0, color="gray", linewidth=0.8)
+    axes[1, 0].axhline(1, color="gray", linewidth=0.8)
+    axes[1, 1].axhline(0, color="gray", linewidth=0.8)
+    fig.suptitle(f"Rolling Metrics ({window} trades)" if isinstance(window, (int, np.integer))
+                 else f"Rolling Metrics ({window})" if window else "Rolling Metrics")
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return fig
+
+def plot_simulation(sim):
+    """Fan chart of simulated equity percentiles next to the max drawdown distribution."""
+    import matplotlib.pyplot as plt
+    if sim is None:
+        return None
+    bands = sim["equity_bands"]
+    cols = list(bands.columns)
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 3.5), gridspec_kw={"width_ratios": [3, 2]})
+    x = bands.index.to_numpy()
+    for i in range(len(cols) // 2):
+        ax1.fill_between(x, bands[cols[i]], bands[cols[-1 - i]], color="tab:blue", alpha=0.15 + 0.15 * i,
+                         label=f"{cols[i]}-{cols[-1 - i]}")
+    ax1.plot(x, bands[cols[len(cols) // 2]], color="tab:blue", linewidth=1.5, label=cols[len(cols) // 2])
+    ax1.set_title(f"Simulated Equity ({sim['paths']:,} {sim['method']} paths)")
+    ax1.set_xlabel("Trade #")
+    ax1.set_ylabel("Cumulative PnL")
+    ax1.legend(fontsize=7, loc="upper left")
+    ax1.grid(True, linestyle="--", alpha=0.4)
+
+    ax2.hist(sim["max_drawdown"], bins=50, color="tab:red", alpha=0.7)
+    ax2.axvline(sim["max_drawdown_pct"][cols[len(cols) // 2]], color="black", linestyle="--", linewidth=1)
+    ax2.set_title("Max Drawdown Distribution")
+    ax2.set_xlabel("Max Drawdown")
+    ax2.set_ylabel("Paths")
+    fig.tight_layout()
+    return fig
+
+def plot_breakdown(breakdown, metric="win_rate", title=None):
+    """Bar chart of one KPI column from a TradeCube roll-up."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(7, 3))
+    values = breakdown[metric]
+    ax.bar([str(i) for i in values.index], values.to_numpy(), color=np.where(values.to_numpy() >= 0, "tab:green", "tab:red"))
+    ax.set_title(title or f"{metric.replace('_', ' ').title()} by {breakdown.index.name or 'group'}")
+    ax.set_ylabel(metric.replace("_", " ").title())
+    ax.tick_params(axis="x", rotation=45)
+    return fig
+
+def plot_underwater(tm, max_points=MAX_LINE_POINTS):
+    """Period equity above its underwater (drawdown) curve, with the longest drawdown shaded."""
+    import matplotlib.pyplot as plt
+    from src.timeseries import FREQ_LABELS
+    series = tm["series"]
+    keep = lttb(series["underwater"].to_numpy(), max_points)
+    x = series.index[keep]
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(8, 4.5), sharex=True, gridspec_kw={"height_ratios": [2, 1]})
+    ax1.plot(x, series["equity"].to_numpy()[keep], color="tab:blue", linewidth=1.5)
+    ax1.set_title(f"Equity and Underwater Curve ({FREQ_LABELS[tm['freq']].lower()})")
+    ax1.set_ylabel("Cumulative PnL")
+    ax1.grid(True, linestyle="--", alpha=0.4)
+    under = series["underwater"].to_numpy()[keep]
+    ax2.fill_between(x, under, 0, color="tab:red", alpha=0.5, step="post")
+    ax2.set_ylabel("Drawdown")
+    ax2.grid(True, linestyle="--", alpha=0.4)
+    drawdowns = tm["drawdowns"]
+    if not drawdowns.empty:
+        longest = drawdowns.loc[drawdowns["duration"].idxmax()]
+        end = longest["recovery"] if longest["recovered"] else series.index[-1]
+        for ax in (ax1, ax2):
+            ax.axvspan(longest["start"], end, color="tab:orange", alpha=0.15)
+    fig.autofmt_xdate()
+    return fig
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _get_pool(max_workers=None):
+    """Lazily start the shared render pool (spawned, so it is safe under Streamlit's threads)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn"),
+                                    initializer=_init_worker)
+    return _pool
+
+def _render_task(name, plot_func, args):
+    """Run one plot function and return (name, png, plotly figure, seconds)."""
+    start = time.perf_counter()
+    result = plot_func(*args)
+    plotly_fig = None
+    if isinstance(result, tuple):
+        plotly_fig, result = result
+    png = fig_to_png(result) if result is not None else None
+    return name, png, plotly_fig, time.perf_counter() - start
+
+def _chart_tasks(df, resolved, metrics):
+    """Plot function and the minimal arguments for every chart, so workers get small payloads."""
+    pnl = metrics["pnl_series"]
+    window = min(ROLLING_WINDOW, max(len(df), 1))
+
+    def cols(*keys):
+        return df[[resolved[k] for k in keys if resolved.get(k) in df.columns]]
+
+    return {
+        "equity": (plot_equity_curve, ({"equity": metrics["equity"]},)),
+        "win_loss": (plot_win_loss_dist, (df[[]], pnl)),
+        "pnl_dist": (plot_pnl_dist, (pnl,)),
+        "market": (plot_market_breakdown, (cols("market"), resolved)),
+        "rr": (plot_rr_vs_pnl, (cols("risk_reward"), resolved, pnl)),
+        "monthly": (plot_monthly_pnl, (cols("date", "pnl"), resolved, resolved["pnl"])),
+        "rolling": (plot_rolling_metrics, (rolling_metrics(df, resolved, window), window))
+    }
+
+@timed()
+def render_charts(df, resolved, metrics, parallel=True, max_workers=None):
+    """Render every chart to in-memory PNG bytes, concurrently on a process pool.
+
+    Returns {name: {"png": bytes or None, "plotly": figure or None, "seconds": float}}
+    in CHART_NAMES order. Falls back to rendering serially if the pool is unavailable.
+    """
+    tasks = _chart_tasks(df, resolved, metrics)
+    results = None
+    if parallel:
+        try:
+            pool = _get_pool(max_workers)
+            futures = [pool.submit(_render_task, name, func, args) for name, (func, args) in tasks.items()]
+            results = [f.result() for f in futures]
+        except (BrokenProcessPool, OSError):
+            global _pool
+            _pool = None
+            results = None
+    if results is None:
+        results = [_render_task(name, func, args) for name, (func, args) in tasks.items()]
+
+    charts = {name: {"png": png, "plotly": plotly_fig, "seconds": secs} for name, png, plotly_fig, secs in results}
+    if profiler.enabled:
+        # Charts may render in worker processes, so only their wall time is known here
+        for name, chart in charts.items():
+            profiler.record(f"chart:{name}", chart["seconds"], depth=1)
+    return {name: charts[name] for name in CHART_NAMES}
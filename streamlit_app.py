@@ -1,25 +1,41 @@
 import streamlit as st
 import pandas as pd
 import os
-from src.data_processor import load_csv, process_data
-from src.analytics import calculate_metrics, get_best_worst_trades
-from src.visualizer import (
-    plot_equity_curve, 
-    plot_win_loss_dist, 
-    plot_pnl_dist, 
-    plot_market_breakdown, 
-    plot_rr_vs_pnl, 
-    plot_monthly_pnl,
-    save_fig_temp
-)
-from src.reporter import generate_pdf_report, cleanup_temp_images
+from src.data_processor import load_csv, process_data, ingest_csv
+from src.analytics import append_metrics, get_best_worst_trades
+from src.visualizer import render_charts, plot_breakdown, plot_simulation, plot_underwater, fig_to_png
+from src.reporter import build_report, report_jobs
 from src.ui_components import manual_entry_ui, sidebar_credits
+from src.storage import save_trades, load_trades, BACKEND
+from src.database import summary_from_db, data_version, journal_breakdown
+from src.cache import analysis_cache, dataset_fingerprint
+from src.cube import TradeCube, DIMENSIONS
+from src.simulation import simulate_paths, scaled_paths, DEFAULT_PATHS
+from src.timeseries import time_metrics, FREQUENCIES, FREQ_LABELS
+from src.profiling import profiler, CAPTURES
+import importlib.util
 
 # Page Config
 st.set_page_config(page_title="TradeTrack", layout="wide", initial_sidebar_state="expanded")
 
 # Sidebar
 sidebar_credits()
+compact_mode = st.sidebar.toggle("Compact memory mode", help="Categorical labels, Arrow notes and lossless downcasts; recommended for multi-million-trade journals.")
+st.sidebar.subheader("🎲 Risk Simulation")
+sim_paths = st.sidebar.select_slider("Simulated paths", options=[1000, 10000, 50000, 100000], value=DEFAULT_PATHS)
+sim_method = st.sidebar.radio("Resampling", ["bootstrap", "shuffle"], horizontal=True)
+sim_capital = st.sidebar.number_input("Starting capital (0 = skip ruin)", min_value=0.0, value=0.0, step=1000.0)
+st.sidebar.subheader("⏱️ Profiling")
+profile_on = st.sidebar.toggle("Profile pipeline", value=profiler.enabled, help="Record wall/CPU time, rows and peak memory for each pipeline stage.")
+capture_options = ["off"] + [c for c in CAPTURES if c == "cprofile" or importlib.util.find_spec(c)]
+capture = st.sidebar.selectbox("Call profile", capture_options, disabled=not profile_on)
+capture = None if capture == "off" else capture
+track_memory = st.sidebar.checkbox("Track peak memory (slows traced stages)", value=True, disabled=not profile_on)
+if not profile_on and profiler.enabled:
+    profiler.disable()
+elif profile_on and (not profiler.enabled or profiler.capture != capture or profiler.memory != track_memory):
+    profiler.disable()
+    profiler.enable(memory=track_memory, capture=capture)
 
 # Header
 st.title("📊 TradeTrack: Advanced Journal")
@@ -30,13 +46,33 @@ Analyze your edge, track your emotions, and export comprehensive reports to leve
 st.write("---")
 
 # Input Selection
-tab1, tab2 = st.tabs(["📂 Upload CSV", "✍️ Manual Entry"])
+tab1, tab2, tab3 = st.tabs(["📂 Upload CSV", "✍️ Manual Entry", "🗄️ Saved Journal"])
 
 with tab1:
     uploaded_file = st.file_uploader("Upload your trades CSV", type=["csv", "txt"])
     if uploaded_file:
-        st.session_state.dataset = load_csv(uploaded_file)
+        # Only re-read the file when a different upload arrives, not on every rerun
+        if st.session_state.get("upload_id") != uploaded_file.file_id:
+            st.session_state.dataset = load_csv(uploaded_file)
+            st.session_state.upload_id = uploaded_file.file_id
         st.success("File uploaded successfully!")
+
+        if st.button("🗄️ Stream File into Journal"):
+            bar = st.progress(0.0, text="Importing...")
+            try:
+                stats = ingest_csv(
+                    uploaded_file,
+                    progress=lambda rows, done, total: bar.progress(done / total if total else 1.0, text=f"{rows:,} rows imported")
+                )
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+            else:
+                bar.progress(1.0, text=f"{stats['rows']:,} rows imported")
+                if stats["inserted"] is not None and stats["inserted"] < stats["rows"]:
+                    st.success(f"✅ Imported {stats['inserted']:,} new trades; {stats['rows'] - stats['inserted']:,} "
+                               f"were already in the journal ({stats['rows_per_sec']:,.0f} rows/sec).")
+                else:
+                    st.success(f"✅ Imported {stats['rows']:,} trades ({stats['rows_per_sec']:,.0f} rows/sec).")
     
     if not uploaded_file and 'dataset' not in st.session_state:
         st.info("⬆️ Upload a CSV to begin. Use the included `trade_log_template.csv` as a template.")
@@ -44,17 +80,126 @@ with tab1:
 with tab2:
     manual_entry_ui()
 
+with tab3:
+    st.caption(f"Storage backend: `{BACKEND}`")
+    # The SQL aggregate scans every saved trade, so it only runs on request and is reused until the next save
+    if BACKEND == "sqlite" and st.toggle("Show journal summary"):
+        summary = analysis_cache.get_or_compute(("db_summary", data_version()), summary_from_db)
+        if not summary["total_trades"]:
+            st.info("No saved trades yet.")
+        else:
+            s1, s2, s3, s4 = st.columns(4)
+            s1.metric("Saved Trades", f"{summary['total_trades']}")
+            s2.metric("Win Rate", f"{summary['win_rate']:.2f}%")
+            s3.metric("Total PnL", f"{summary['total_pnl']:.2f}")
+            s4.metric("Profit Factor", f"{summary['profit_factor']:.2f}")
+            journal_dim = st.selectbox("Saved trades by", DIMENSIONS)
+            st.dataframe(journal_breakdown(journal_dim)[["count", "win_rate", "expectancy", "profit_factor", "sum_pnl"]],
+                         use_container_width=True)
+    if st.button("Load Saved Trades"):
+        saved = load_trades()
+        if saved.empty:
+            st.warning("⚠️ No saved trades found.")
+        else:
+            st.session_state.dataset = saved
+            st.success(f"✅ Loaded {len(saved)} saved trades.")
+
+def report_panel(pdf_key):
+    """Progress, cancel and download controls for the background PDF job."""
+    job_id = st.session_state.report_jobs[pdf_key]
+    status = report_jobs.status(job_id)
+    active = status["state"] in ("queued", "running")
+
+    @st.fragment(run_every=1.0 if active else None)
+    def poll():
+        status = report_jobs.status(job_id)
+        if status["state"] in ("queued", "running"):
+            st.progress(status["progress"], text=f"Building report... {status['progress'] * 100:.0f}%")
+            if st.button("✖️ Cancel Report"):
+                report_jobs.cancel(job_id)
+                st.rerun()
+        elif active:
+            # Finished since the last full run: rerun once to stop polling
+            st.rerun()
+        elif status["state"] == "done":
+            st.download_button(
+                label="📥 Download PDF Report",
+                data=report_jobs.result(job_id),
+                file_name="trade_report.pdf",
+                mime="application/pdf"
+            )
+        elif status["state"] == "failed":
+            st.error(f"Report generation failed: {status['error']}")
+        else:
+            st.info("Report generation cancelled.")
+            if st.button("🔁 Rebuild Report"):
+                st.session_state.report_jobs.pop(pdf_key, None)
+                st.rerun()
+
+    poll()
+
+def session_metrics(df, resolved):
+    """Metrics for the dataset; trades appended since this session's last analysis are folded in incrementally."""
+    metrics, st.session_state.metrics_acc = append_metrics(st.session_state.get("metrics_acc"), df, resolved)
+    return metrics
+
+def simulation_panel(job_id):
+    """Progress and cancel controls for a background simulation; reruns the page once it finishes."""
+    status = report_jobs.status(job_id)
+    active = status["state"] in ("queued", "running")
+
+    @st.fragment(run_every=1.0 if active else None)
+    def poll():
+        status = report_jobs.status(job_id)
+        if status["state"] in ("queued", "running"):
+            st.progress(status["progress"], text=f"Simulating paths... {status['progress'] * 100:.0f}%")
+            if st.button("✖️ Cancel Simulation"):
+                report_jobs.cancel(job_id)
+                st.rerun()
+        elif active:
+            st.rerun()
+        elif status["state"] == "failed":
+            st.error(f"Simulation failed: {status['error']}")
+        elif status["state"] == "cancelled":
+            st.info("Simulation cancelled.")
+
+    poll()
+
 if 'dataset' in st.session_state:
-    df = st.session_state.dataset
+    raw = st.session_state.dataset
+    # Fingerprint once per dataset object, then reuse it across reruns
+    if st.session_state.get("dataset_obj_id") != id(raw):
+        st.session_state.dataset_fp = dataset_fingerprint(raw)
+        st.session_state.dataset_obj_id = id(raw)
+    raw_fp = st.session_state.dataset_fp
+
     # Data Processing
-    df, resolved = process_data(df)
+    df, resolved = analysis_cache.get_or_compute(
+        ("processed", raw_fp, compact_mode), lambda: process_data(raw, compact=compact_mode)
+    )
+    key = (raw_fp, compact_mode, tuple(sorted(resolved.items())))
     
     st.subheader("Preview of Data")
+    if "memory" in df.attrs:
+        mem = df.attrs["memory"]
+        st.caption(f"Memory: {mem['before_mb']:.2f} MB raw → {mem['after_mb']:.2f} MB compact")
     st.dataframe(df.head(10), use_container_width=True)
 
+    if st.button("💾 Save to Journal"):
+        result = save_trades(df, resolved)
+        if isinstance(result, dict) and result["skipped"]:
+            st.success(f"✅ Saved {result['inserted']:,} new trades to the `{BACKEND}` journal; "
+                       f"{result['skipped']:,} were already in it.")
+        else:
+            saved = result["inserted"] if isinstance(result, dict) else len(df)
+            st.success(f"✅ Saved {saved:,} trades to the `{BACKEND}` journal.")
+
     if st.button("📈 Get Full Analysis"):
+        st.session_state.analysis_key = key
+    # Keep the analysis on screen across reruns (widgets, report polling) for this dataset
+    if st.session_state.get("analysis_key") == key:
         with st.spinner("Analyzing your trades..."):
-            metrics = calculate_metrics(df, resolved)
+            metrics = analysis_cache.get_or_compute(("metrics", key), lambda: session_metrics(df, resolved))
             
             if metrics is None:
                 st.error("Could not calculate metrics. Please ensure your data has a PnL column or enough info to calculate it (Entry, Exit, Quantity).")
@@ -75,53 +220,111 @@ if 'dataset' in st.session_state:
 
                 # 2. Charts
                 st.subheader("📊 Performance Visualizations")
-                temp_images = []
+                charts = analysis_cache.get_or_compute(("charts", key), lambda: render_charts(df, resolved, metrics))
 
                 # Row 1
                 c1, c2 = st.columns(2)
                 with c1:
-                    fig1 = plot_equity_curve(metrics)
-                    st.pyplot(fig1)
-                    temp_images.append(save_fig_temp(fig1))
+                    st.image(charts["equity"]["png"], use_container_width=True)
                 with c2:
-                    fig2 = plot_win_loss_dist(df, metrics["pnl_series"])
-                    st.pyplot(fig2)
-                    temp_images.append(save_fig_temp(fig2))
+                    st.image(charts["win_loss"]["png"], use_container_width=True)
 
                 # Row 2
                 c3, c4 = st.columns(2)
                 with c3:
-                    fig3 = plot_pnl_dist(metrics["pnl_series"])
-                    st.pyplot(fig3)
-                    temp_images.append(save_fig_temp(fig3))
+                    st.image(charts["pnl_dist"]["png"], use_container_width=True)
                 with c4:
-                    fig4 = plot_market_breakdown(df, resolved)
-                    if fig4:
-                        st.pyplot(fig4)
-                        temp_images.append(save_fig_temp(fig4))
+                    if charts["market"]["png"]:
+                        st.image(charts["market"]["png"], use_container_width=True)
                     else:
                         st.info("Market data not available for breakdown.")
 
                 # Row 3
                 c5, c6 = st.columns(2)
                 with c5:
-                    fig5 = plot_rr_vs_pnl(df, resolved, metrics["pnl_series"])
-                    if fig5:
-                        st.pyplot(fig5)
-                        temp_images.append(save_fig_temp(fig5))
+                    if charts["rr"]["png"]:
+                        st.image(charts["rr"]["png"], use_container_width=True)
                     else:
                         st.info("Risk:Reward data not available.")
                 with c6:
-                    fig6_plotly, fig6_mpl = plot_monthly_pnl(df, resolved, resolved["pnl"])
-                    if fig6_plotly:
-                        st.plotly_chart(fig6_plotly, use_container_width=True)
-                        temp_images.append(save_fig_temp(fig6_mpl))
+                    if charts["monthly"]["plotly"]:
+                        st.plotly_chart(charts["monthly"]["plotly"], use_container_width=True)
                     else:
                         st.info("Date data not available for monthly analysis.")
 
+                # Row 4
+                if charts["rolling"]["png"]:
+                    st.image(charts["rolling"]["png"], use_container_width=True)
+
+                with st.expander("⏱️ Chart render timings"):
+                    st.dataframe(
+                        pd.DataFrame({"chart": list(charts), "seconds": [c["seconds"] for c in charts.values()]}),
+                        use_container_width=True
+                    )
+
+                # Calendar-based risk
+                if resolved.get("date") in df.columns:
+                    st.subheader("📅 Time-Based Risk")
+                    freq = st.radio("Resample to", list(FREQUENCIES), format_func=FREQ_LABELS.get, horizontal=True)
+                    tm = analysis_cache.get_or_compute(("time_metrics", key, freq), lambda: time_metrics(df, resolved, freq))
+                    if tm is None:
+                        st.info("No dated trades to resample.")
+                    else:
+                        d1, d2, d3, d4, d5 = st.columns(5)
+                        d1.metric("Annualized Sharpe", f"{tm['sharpe_annual']:.2f}")
+                        d2.metric("Annualized Sortino", f"{tm['sortino_annual']:.2f}")
+                        d3.metric("Calmar", f"{tm['calmar']:.2f}")
+                        d4.metric("Max DD Duration", f"{tm['max_drawdown_duration'].days} days")
+                        ttr = tm["time_to_recovery"]
+                        d5.metric("Time to Recovery", f"{ttr.days} days" if pd.notna(ttr) else "not recovered")
+                        if tm["undated_trades"]:
+                            st.caption(f"{tm['undated_trades']:,} trades without a date are left out.")
+                        underwater_png = analysis_cache.get_or_compute(
+                            ("underwater_png", key, freq), lambda: fig_to_png(plot_underwater(tm))
+                        )
+                        st.image(underwater_png, use_container_width=True)
+                        with st.expander("Drawdown periods"):
+                            st.dataframe(tm["drawdowns"].head(50), use_container_width=True)
+
+                # Monte Carlo risk, simulated on request in the background
+                st.subheader("🎲 Monte Carlo Risk")
+                n_trades = len(metrics["pnl_series"])
+                paths = scaled_paths(sim_paths, n_trades)
+                if paths < sim_paths:
+                    st.caption(f"Limited to {paths:,} paths for {n_trades:,} trades.")
+                sim_key = ("simulation", key, paths, sim_method, sim_capital)
+                sim_jobs = st.session_state.setdefault("sim_jobs", {})
+                sim = analysis_cache.get(sim_key)
+                if sim is None and report_jobs.status(sim_jobs.get(sim_key))["state"] == "done":
+                    sim = report_jobs.result(sim_jobs[sim_key])
+                    analysis_cache.put(sim_key, sim)
+                sim_png = None
+                if sim is None:
+                    running = report_jobs.status(sim_jobs.get(sim_key))["state"] in ("queued", "running")
+                    if not running and st.button("🎲 Run Simulation"):
+                        sim_jobs[sim_key] = report_jobs.submit(
+                            simulate_paths, metrics["pnl_series"], paths, sim_method,
+                            capital=sim_capital or None, workers=os.cpu_count()
+                        )
+                    if sim_key in sim_jobs:
+                        simulation_panel(sim_jobs[sim_key])
+                else:
+                    m1, m2, m3, m4 = st.columns(4)
+                    m1.metric("Median Final PnL", f"{sim['final_equity_pct']['p50']:.2f}")
+                    m2.metric("5th pct Final PnL", f"{sim['final_equity_pct']['p5']:.2f}")
+                    m3.metric("Median Max Drawdown", f"{sim['max_drawdown_pct']['p50']:.2f}")
+                    m4.metric("Prob. of Ruin", f"{sim['prob_ruin'] * 100:.2f}%" if sim["prob_ruin"] is not None else "n/a")
+                    sim_png = analysis_cache.get_or_compute(
+                        ("simulation_png",) + sim_key[1:], lambda: fig_to_png(plot_simulation(sim))
+                    )
+                    st.image(sim_png, use_container_width=True)
+                    with st.expander("Percentile bands"):
+                        st.dataframe(sim["equity_bands"].join(sim["drawdown_bands"], lsuffix="_equity", rsuffix="_drawdown"),
+                                     use_container_width=True)
+
                 # 3. Best/Worst Trades
                 st.subheader("🏆 Best & Worst Trades")
-                best, worst = get_best_worst_trades(df, resolved)
+                best, worst = analysis_cache.get_or_compute(("best_worst", key), lambda: get_best_worst_trades(df, resolved))
                 
                 cols_to_show = [resolved.get(k) for k in ["date", "market", "entry", "exit_price", "pnl"] if resolved.get(k) and resolved.get(k) in df.columns]
                 
@@ -133,14 +336,48 @@ if 'dataset' in st.session_state:
 
                 # 4. Export
                 st.subheader("📄 Export Report")
-                pdf_buffer = generate_pdf_report(metrics, temp_images)
-                st.download_button(
-                    label="📥 Download PDF Report",
-                    data=pdf_buffer,
-                    file_name="trade_report.pdf",
-                    mime="application/pdf"
-                )
-                
-                # Cleanup
-                cleanup_temp_images(temp_images)
+                # The report includes the simulation once it has run
+                pdf_key = ("pdf", key) + (sim_key[2:] if sim is not None else ())
+                jobs = st.session_state.setdefault("report_jobs", {})
+                if report_jobs.status(jobs.get(pdf_key))["state"] in ("unknown", "failed"):
+                    # Build the PDF in the background so the page stays responsive
+                    previous = st.session_state.get("report_job")
+                    if previous and report_jobs.status(previous)["state"] in ("queued", "running"):
+                        report_jobs.cancel(previous)
+                    images = [c["png"] for c in charts.values() if c["png"]] + ([sim_png] if sim_png else [])
+                    jobs[pdf_key] = report_jobs.submit(build_report, df, resolved, metrics, images, sim)
+                st.session_state.report_job = jobs[pdf_key]
+                report_panel(pdf_key)
                 st.success("Analysis complete!")
+
+    with st.expander("🧊 Breakdown Explorer"):
+        cube = analysis_cache.get_or_compute(("cube", key), lambda: TradeCube.from_trades(df, resolved))
+        if cube is None:
+            st.info("PnL data is required for breakdowns.")
+        else:
+            b1, b2 = st.columns(2)
+            dim = b1.selectbox("Break down by", DIMENSIONS)
+            kpi = b2.selectbox("Metric", ["win_rate", "expectancy", "profit_factor", "sharpe", "sum_pnl", "count"])
+            breakdown = cube.rollup(dim)
+            st.image(fig_to_png(plot_breakdown(breakdown, kpi)), use_container_width=True)
+            st.dataframe(breakdown, use_container_width=True)
+
+if profiler.enabled:
+    with st.sidebar.expander("Pipeline profile", expanded=True):
+        summary = profiler.summary()
+        if summary.empty:
+            st.caption("No stages recorded yet.")
+        else:
+            st.dataframe(summary.round(4), use_container_width=True)
+            st.download_button("Download profile JSON", profiler.to_json(), file_name="tradetrack_profile.json",
+                               mime="application/json")
+            for name, text in profiler.profiles.items():
+                with st.popover(f"Call profile: {name}"):
+                    st.code(text)
+            if st.button("Clear profile"):
+                profiler.clear()
+                st.rerun()
+
+cache_stats = analysis_cache.stats()
+st.sidebar.caption(f"Analysis cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['size']}/{cache_stats['maxsize']} entries, {cache_stats['mb']:.0f}/{cache_stats['max_mb']:.0f} MB)")